@@ -90,6 +90,53 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Results of sequencing requests are cached in the "sequencing" cache. Local memory is used by default, to share
+# results between gunicorn workers point SEQUENCING_CACHE_BACKEND to a file or database cache.
+# The local memory cache drops the least recently used responses once they take more than SEQUENCING_CACHE_MAX_SIZE
+# bytes, so every server process keeps at most that much, and responses larger than
+# SEQUENCING_CACHE_MAX_RESPONSE_SIZE bytes are never cached.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sequencing': {
+        'BACKEND': os.getenv('SEQUENCING_CACHE_BACKEND', 'sequencing.cache.SizeBoundedLocMemCache'),
+        'LOCATION': os.getenv('SEQUENCING_CACHE_LOCATION', 'sequencing'),
+        'TIMEOUT': int(os.getenv('SEQUENCING_CACHE_TIMEOUT', 60 * 60)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('SEQUENCING_CACHE_MAX_ENTRIES', 256)),
+            'MAX_SIZE': int(os.getenv('SEQUENCING_CACHE_MAX_SIZE', 256 * 1024 * 1024)),
+        },
+    },
+}
+
+SEQUENCING_CACHE_MAX_RESPONSE_SIZE = int(os.getenv('SEQUENCING_CACHE_MAX_RESPONSE_SIZE', 16 * 1024 * 1024))
+
+# Searches of the visualization endpoints run in a pool of SEQUENCING_SOLVER_WORKERS processes per server process
+
+SEQUENCING_SOLVER_WORKERS = int(os.getenv('SEQUENCING_SOLVER_WORKERS', os.cpu_count() or 1))
+
+# Timed executions run every solver in its own process. A server process runs at most SEQUENCING_TIMED_EXECUTIONS of
+# them at a time and answers other timed execution requests with 503 until one of them is done.
+
+SEQUENCING_TIMED_EXECUTIONS = int(os.getenv('SEQUENCING_TIMED_EXECUTIONS', 1))
+
+# Sequencing jobs run in a pool of SEQUENCING_JOB_WORKERS local processes and keep their state in the database.
+# Brute force and branch and bound jobs split their search over SEQUENCING_JOB_SEARCH_WORKERS more processes.
+
+SEQUENCING_JOB_WORKERS = int(os.getenv('SEQUENCING_JOB_WORKERS', 2))
+SEQUENCING_JOB_SEARCH_WORKERS = int(os.getenv('SEQUENCING_JOB_SEARCH_WORKERS', 1))
+SEQUENCING_JOB_MAX_SECONDS = int(os.getenv('SEQUENCING_JOB_MAX_SECONDS', 60 * 60))
+
+# Searches of the visualization endpoints count what they did and report it in the Server-Timing header and on the
+# metrics endpoint. Set SEQUENCING_STATS to 0 to turn the counters off.
+
+SEQUENCING_STATS = os.getenv('SEQUENCING_STATS', '1') != '0'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
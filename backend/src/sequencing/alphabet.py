@@ -0,0 +1,54 @@
+from types import MappingProxyType
+
+from .consts import AMINO_ACID_MASSES, MONOISOTOPIC_AMINO_ACID_MASSES
+
+
+# Amino acids a search may use, with everything the solvers look up about them computed once when the alphabet is
+# built. Letters keep the order in which they were given (the empty amino acid is left out), masses are
+# deduplicated in the order in which they first appear and amino_acids_by_mass has the letters of every mass.
+# Alphabets can't be changed once they are built.
+class Alphabet:
+    __slots__ = ("letters", "letter_masses", "masses", "multiplicities", "amino_acids_by_mass", "letter_order")
+
+    def __init__(self, amino_acid_candidates=AMINO_ACID_MASSES.keys(), amino_acid_masses=AMINO_ACID_MASSES):
+        letters = tuple(dict.fromkeys(amino_acid for amino_acid in amino_acid_candidates if amino_acid != ""))
+
+        amino_acids_by_mass = {}
+        for amino_acid in letters:
+            amino_acids_by_mass.setdefault(amino_acid_masses[amino_acid], []).append(amino_acid)
+
+        # Peptides are spelled out with the letters of the same mass next to each other
+        letter_order = {}
+        for amino_acids in amino_acids_by_mass.values():
+            for amino_acid in amino_acids:
+                letter_order[amino_acid] = len(letter_order)
+
+        set_attribute = super().__setattr__
+        set_attribute("letters", letters)
+        set_attribute("letter_masses", tuple((amino_acid, amino_acid_masses[amino_acid]) for amino_acid in letters))
+        set_attribute("masses", tuple(amino_acids_by_mass))
+        set_attribute("multiplicities", tuple(len(amino_acids) for amino_acids in amino_acids_by_mass.values()))
+        set_attribute("amino_acids_by_mass", MappingProxyType({
+            amino_acid_mass: tuple(amino_acids) for amino_acid_mass, amino_acids in amino_acids_by_mass.items()
+        }))
+        set_attribute("letter_order", MappingProxyType(letter_order))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Alphabet can't be changed")
+
+    def __reduce__(self):
+        # Workers get the letters and their masses and build the same alphabet again
+        return Alphabet, (self.letters, dict(self.letter_masses))
+
+    def __len__(self):
+        return len(self.letters)
+
+
+DEFAULT_ALPHABET = Alphabet()
+
+MONOISOTOPIC_ALPHABET = Alphabet(amino_acid_masses=MONOISOTOPIC_AMINO_ACID_MASSES)
+
+
+def alphabet_for(tolerance):
+    # Integer masses when masses have to be the same, real ones when they are matched within a tolerance
+    return DEFAULT_ALPHABET if tolerance is None else MONOISOTOPIC_ALPHABET
@@ -0,0 +1,65 @@
+import asyncio
+from itertools import islice
+from json import dumps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .alphabet import DEFAULT_ALPHABET
+from .budget import Budget
+from .common_functions import count_peptides_by_mass
+from .consts import SEARCH_BUDGETS
+from .jobs import solve
+from .offload import solver_executor
+
+
+def shared_peptide_counts(algorithm, spectra, parameters):
+    # Searches with integer masses skip peptides whose remaining mass can't be made of amino acids. Whether a mass
+    # can be made doesn't depend on the spectrum, so it is found once for the heaviest peptide of the batch instead
+    # of once per spectrum. Counts are cut down to 1, which keeps the table small enough to send to every worker.
+    if algorithm not in ("brute_force", "branch_and_bound", "leaderboard") or "tolerance" in parameters:
+        return None
+
+    max_peptide_mass = max(target_spectrum[-1] for target_spectrum in spectra)
+    return bytes(count_peptides_by_mass(max_peptide_mass, DEFAULT_ALPHABET, max_count=1))
+
+
+def batch_result(index, algorithm, target_spectrum, parameters, peptide_counts=None):
+    # Runs in a worker of the solver pool. Workers keep their alphabets and imports between searches, so only the
+    # first spectrum a worker gets pays for them. A spectrum that can't be sequenced only fails its own line.
+    limits = SEARCH_BUDGETS[algorithm]
+    budget = Budget(limits["max_nodes"], limits["max_seconds"])
+
+    try:
+        result = solve(algorithm, target_spectrum, parameters, budget, peptide_counts=peptide_counts)
+    except Exception as error:
+        return {"index": index, "error": str(error)}
+
+    return {"index": index, **result}
+
+
+async def batch_lines(algorithm, spectra, parameters):
+    # Yields the result of every spectrum as soon as its search is done. At most one search per worker of the pool
+    # waits for it at a time, so a large batch doesn't hold up the searches of other requests.
+    loop = asyncio.get_running_loop()
+    peptide_counts = await sync_to_async(shared_peptide_counts, thread_sensitive=False)(algorithm, spectra,
+                                                                                         parameters)
+    remaining = iter(enumerate(spectra))
+    pending = set()
+
+    try:
+        while True:
+            for index, target_spectrum in islice(remaining, settings.SEQUENCING_SOLVER_WORKERS - len(pending)):
+                pending.add(loop.run_in_executor(solver_executor(), batch_result, index, algorithm, target_spectrum,
+                                                 parameters, peptide_counts))
+
+            if len(pending) == 0:
+                return
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for result in done:
+                yield dumps(result.result()) + "\n"
+    finally:
+        # Searches of a client that went away are dropped unless they already started
+        for result in pending:
+            result.cancel()
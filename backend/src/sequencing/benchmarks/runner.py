@@ -0,0 +1,109 @@
+import random
+import statistics
+import time
+import tracemalloc
+
+from ..budget import Budget
+from ..consts import (BENCHMARK_NUMBER_OF_LARGEST_ELEMENTS, BENCHMARK_MIN_TIME_IN_SECONDS, BENCHMARK_MISSING_PEAKS,
+                      BENCHMARK_FALSE_PEAKS, BENCHMARK_NOISE_FLOORS, SEARCH_BUDGETS)
+from ..jobs import solve
+from ..utils import leaderboard_sequencing
+from .spectra import random_peptide, synthetic_spectrum
+
+METRICS = ("seconds", "peak_memory", "nodes")
+
+
+def benchmark_spectra(lengths, cyclic=True, missing_peaks=BENCHMARK_MISSING_PEAKS, false_peaks=BENCHMARK_FALSE_PEAKS,
+                      seed=0):
+    # An exact and a noisy spectrum of a random peptide of every length. Spectra only depend on the seed and the
+    # length, so the same settings always give the same spectra.
+    spectra = {}
+
+    for length in lengths:
+        rng = random.Random(f"{seed}:{length}")
+        peptide = random_peptide(length, rng=rng)
+        spectra[f"exact/{length}"] = synthetic_spectrum(peptide, cyclic=cyclic, rng=rng)
+        spectra[f"noisy/{length}"] = synthetic_spectrum(peptide, cyclic=cyclic, missing_peaks=missing_peaks,
+                                                        false_peaks=false_peaks, rng=rng)
+
+    return spectra
+
+
+def benchmark_budget(algorithm):
+    # Only the limit on nodes is kept, so how far a search gets doesn't depend on how fast the machine is
+    if algorithm.startswith("leaderboard"):
+        algorithm = "leaderboard"
+
+    return Budget(max_nodes=SEARCH_BUDGETS[algorithm]["max_nodes"])
+
+
+def run_case(algorithm, target_spectrum, budget):
+    # Searches are run the same way as jobs run them, only the leaderboard that keeps every round is run on its own
+    if algorithm == "leaderboard":
+        return leaderboard_sequencing(target_spectrum, budget=budget)
+    if algorithm == "leaderboard_without_additional_data":
+        algorithm = "leaderboard"
+
+    return solve(algorithm, target_spectrum, {"number_of_largest_elements": BENCHMARK_NUMBER_OF_LARGEST_ELEMENTS},
+                 budget)
+
+
+def measure(algorithm, target_spectrum, repeat):
+    # Tracing allocations slows the solver down, so memory is measured in a separate run. It goes first and warms
+    # up everything the solver uses, then the median of at least repeat timed runs is kept.
+    tracemalloc.start()
+    try:
+        run_case(algorithm, target_spectrum, benchmark_budget(algorithm))
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    seconds = []
+    while len(seconds) < repeat or sum(seconds) < BENCHMARK_MIN_TIME_IN_SECONDS:
+        budget = benchmark_budget(algorithm)
+        start = time.perf_counter()
+        result = run_case(algorithm, target_spectrum, budget)
+        seconds.append(time.perf_counter() - start)
+
+    return {
+        "seconds": statistics.median(seconds),
+        "peak_memory": peak_memory,
+        "nodes": budget.number_of_nodes,
+        "truncated": budget.truncated,
+        "solutions": len(result["solution"])
+    }
+
+
+def run_benchmarks(algorithms, spectra, repeat=3):
+    # Yields every case as soon as it is measured
+    for algorithm in algorithms:
+        for name, target_spectrum in spectra.items():
+            yield f"{algorithm}/{name}", measure(algorithm, target_spectrum, repeat)
+
+
+def compare(baseline, results, threshold):
+    # Relative change of every metric of the cases that were run both times. A metric that grew by more than the
+    # threshold and by more than its noise floor is a regression.
+    changes = []
+
+    for case, result in results.items():
+        if case not in baseline:
+            continue
+
+        for metric in METRICS:
+            old, new = baseline[case][metric], result[metric]
+            if old == 0:
+                change = 0 if new == 0 else float("inf")
+            else:
+                change = (new - old) / old
+
+            changes.append({
+                "case": case,
+                "metric": metric,
+                "baseline": old,
+                "current": new,
+                "change": change,
+                "regression": change > threshold and new - old > BENCHMARK_NOISE_FLOORS[metric]
+            })
+
+    return changes
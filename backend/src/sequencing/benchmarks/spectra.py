@@ -0,0 +1,25 @@
+import random
+
+from ..alphabet import DEFAULT_ALPHABET
+from ..candidate import Candidate
+
+
+def random_peptide(length, alphabet=DEFAULT_ALPHABET, rng=random):
+    return "".join(rng.choice(alphabet.letters) for _ in range(length))
+
+
+def synthetic_spectrum(peptide, alphabet=DEFAULT_ALPHABET, cyclic=True, missing_peaks=0, false_peaks=0, rng=random):
+    # Theoretical spectrum of the peptide without a missing_peaks share of its fragments and with a false_peaks share
+    # of random masses added. The empty fragment and the whole peptide are always kept, since the solvers take the
+    # last mass as the mass of the peptide.
+    letter_masses = dict(alphabet.letter_masses)
+    candidate = Candidate()
+    for amino_acid in peptide:
+        candidate = candidate.extend(amino_acid, letter_masses[amino_acid])
+
+    spectrum = candidate.cyclic_spectrum if cyclic else candidate.linear_spectrum
+    fragments = spectrum[1:-1]
+    kept = rng.sample(fragments, len(fragments) - round(len(fragments) * missing_peaks))
+    noise = [rng.randint(1, int(candidate.mass) - 1) for _ in range(round(len(fragments) * false_peaks))]
+
+    return [0] + sorted(kept + noise) + [candidate.mass]
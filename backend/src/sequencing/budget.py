@@ -0,0 +1,112 @@
+import time
+
+from .alphabet import DEFAULT_ALPHABET
+from .common_functions import count_peptides_by_mass
+from .consts import MAX_NUMBER_OF_CANDIDATES
+from .spectrum_graph import count_paths, spectrum_graph
+from .stats import NO_STATS
+
+
+# Limit on the work a single search may do. Solvers spend the budget before they extend peptides and stop once it
+# runs out, returning what they found so far with the budget marked as truncated. The estimated number of nodes is
+# only kept to decide where the search is run. Stats of the search travel with the budget, by default nothing is
+# collected. The time of the search is counted from when it first spends the budget, so time spent waiting for a
+# worker isn't taken from it.
+class Budget:
+    CHECK_INTERVAL_IN_SECONDS = None
+
+    def __init__(self, max_nodes=None, max_seconds=None, estimated_nodes=None, stats=NO_STATS):
+        self.max_nodes = max_nodes
+        self.estimated_nodes = estimated_nodes
+        self.stats = stats
+        self.max_seconds = max_seconds
+        self.deadline = None
+        self.number_of_nodes = 0
+        self.truncated = False
+
+    def spend(self, number_of_nodes):
+        if self.truncated:
+            return False
+        if self.deadline is None:
+            self.start()
+
+        self.number_of_nodes += number_of_nodes
+        if self.max_nodes is not None and self.number_of_nodes > self.max_nodes:
+            self.truncated = True
+        elif self.deadline is not None and time.monotonic() > self.deadline:
+            self.truncated = True
+
+        return not self.truncated
+
+    def start(self):
+        if self.max_seconds is not None:
+            self.deadline = time.monotonic() + self.max_seconds
+
+    def check(self):
+        # Called every CHECK_INTERVAL_IN_SECONDS while parts of the search run in other processes (never if it is
+        # None), tells whether the parts should keep going
+        return True
+
+    def merge(self, part):
+        # Adds what a part of the search did in another process
+        self.number_of_nodes += part.number_of_nodes
+        self.truncated = self.truncated or part.truncated
+        self.stats.merge(part.stats)
+
+    def split(self, number_of_parts, part=None):
+        # Budget of one of number_of_parts searches that run at the same time, they share the deadline and the
+        # nodes that are left. Budgets that do more than count nodes pass their own kind of part.
+        if part is None:
+            part = Budget()
+
+        if self.deadline is None:
+            self.start()
+
+        part.deadline = self.deadline
+        part.stats = self.stats.split()
+        if self.max_nodes is not None:
+            part.max_nodes = max(self.max_nodes - self.number_of_nodes, 0) // number_of_parts
+
+        return part
+
+
+def estimate_number_of_nodes(algorithm, target_spectrum, alphabet=DEFAULT_ALPHABET, limit=None, graph=None):
+    # Number of peptides the search creates, exact for brute force and an upper bound for the rest. With a limit
+    # estimates above it are only known to be above it, they are returned as limit + 1 and every count is cut down to
+    # that on the way, so heavy spectra are never counted with huge integers. Spectrum graph searches pass the graph
+    # they already built.
+    max_count = None if limit is None else limit + 1
+    number_of_amino_acids = len(alphabet)
+    target_peptide_mass = target_spectrum[-1]
+
+    if number_of_amino_acids == 0:
+        return 1
+
+    if algorithm == "brute_force":
+        # Every peptide lighter than the target is extended by every amino acid
+        peptide_counts = count_peptides_by_mass(target_peptide_mass, alphabet, max_count)
+        estimated_nodes = 1 + number_of_amino_acids * sum(peptide_counts[:target_peptide_mass])
+    elif algorithm == "branch_and_bound":
+        # All prefix masses of a consistent peptide are in the spectrum, so only peptides that step from one mass
+        # of the spectrum to another are extended
+        peptide_counts = {0: 1}
+        for mass in sorted(set(target_spectrum)):
+            if 0 < mass < target_peptide_mass:
+                peptide_count = sum(multiplicity * peptide_counts.get(mass - amino_acid_mass, 0)
+                                    for amino_acid_mass, multiplicity in zip(alphabet.masses, alphabet.multiplicities))
+                peptide_counts[mass] = peptide_count if max_count is None else min(peptide_count, max_count)
+
+        estimated_nodes = 1 + number_of_amino_acids * sum(peptide_counts.values())
+    elif algorithm == "spectrum_graph":
+        # Peptides only follow the edges of the spectrum graph, so at most one peptide is created for every path
+        # from 0 to a mass of the graph
+        if graph is None:
+            graph = spectrum_graph(target_spectrum, alphabet)
+        estimated_nodes = sum(count_paths(graph, max_count).values())
+    else:
+        # Leaderboard extends at most MAX_NUMBER_OF_CANDIDATES peptides (ties aside) in every round, and every round
+        # adds at least the lightest amino acid
+        number_of_rounds = int(target_peptide_mass // min(alphabet.masses)) + 1
+        estimated_nodes = 1 + number_of_rounds * MAX_NUMBER_OF_CANDIDATES * number_of_amino_acids
+
+    return estimated_nodes if max_count is None else min(estimated_nodes, max_count)
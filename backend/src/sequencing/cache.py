@@ -0,0 +1,98 @@
+from functools import wraps
+from hashlib import sha256
+from json import loads, dumps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+
+from .consts import AMINO_ACID_MASSES, MAX_NUMBER_OF_CANDIDATES, MONOISOTOPIC_AMINO_ACID_MASSES
+
+RESULT_CACHE = "sequencing"
+
+# Sizes of the values of every local memory cache, by the name of the cache like the values themselves
+_sizes = {}
+
+
+# Local memory cache that also drops the least recently used entries once its values take more than MAX_SIZE bytes.
+# Responses of the same endpoint can differ in size by orders of magnitude, so the number of entries alone doesn't
+# bound the memory the cache takes.
+class SizeBoundedLocMemCache(LocMemCache):
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self._max_size = int(params.get("OPTIONS", {}).get("MAX_SIZE", 256 * 1024 * 1024))
+        self._sizes = _sizes.setdefault(name, {})
+
+    def _set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        super()._set(key, value, timeout)
+        self._sizes[key] = len(value)
+
+        # The entry that was just set is the most recently used one, so it is never dropped here
+        size = sum(self._sizes.values())
+        while size > self._max_size and len(self._cache) > 1:
+            dropped_key, _ = self._cache.popitem()
+            del self._expire_info[dropped_key]
+            size -= self._sizes.pop(dropped_key)
+
+    def _cull(self):
+        super()._cull()
+        for key in self._sizes.keys() - self._cache.keys():
+            del self._sizes[key]
+
+    def _delete(self, key):
+        self._sizes.pop(key, None)
+        return super()._delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._expire_info.clear()
+            self._sizes.clear()
+
+
+def result_cache_key(endpoint, body, number_of_largest_elements=None):
+    # The spectrum is used exactly as it was sent, since the solvers take its last element as the peptide mass
+    options = {key: value for key, value in body.items() if key != "target_spectrum"}
+    canonical = dumps([
+        endpoint,
+        body.get("target_spectrum"),
+        MAX_NUMBER_OF_CANDIDATES,
+        number_of_largest_elements,
+        AMINO_ACID_MASSES,
+        MONOISOTOPIC_AMINO_ACID_MASSES,
+        options
+    ], sort_keys=True)
+
+    return f"{endpoint}:{sha256(canonical.encode()).hexdigest()}"
+
+
+def cached_result(endpoint):
+    # Serves the already serialized response when the same request was answered before. Streamed responses,
+    # responses marked with "Cache-Control: no-store" and responses larger than SEQUENCING_CACHE_MAX_RESPONSE_SIZE
+    # are never cached.
+    def decorator(post):
+        @wraps(post)
+        async def wrapper(cls, request):
+            body = loads(request.body)
+            if body.get("stream"):
+                return await post(cls, request)
+
+            cache = caches[RESULT_CACHE]
+            key = result_cache_key(endpoint, body, getattr(cls, "NUMBER_OF_LARGEST_ELEMENTS", None))
+            content = await cache.aget(key)
+            if content is not None:
+                return HttpResponse(content, content_type="application/json")
+
+            response = await post(cls, request)
+            if (response.status_code == 200 and response.get("Cache-Control") != "no-store"
+                    and len(response.content) <= settings.SEQUENCING_CACHE_MAX_RESPONSE_SIZE):
+                await cache.aset(key, response.content)
+
+            return response
+
+        return wrapper
+
+    return decorator
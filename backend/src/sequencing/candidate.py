@@ -0,0 +1,105 @@
+# Peptide built by appending one amino acid at a time. Prefix masses and spectra are derived from the
+# parent candidate on first access and cached, so extending a peptide never rebuilds its whole spectrum.
+# Candidates extended by mass only don't keep a peptide string (peptide is None), all peptides with the same
+# sequence of amino acid masses are represented by that single candidate.
+# The mass of the last amino acid is kept as it was added, since with real masses it can't be recovered exactly
+# from the difference of the prefix masses.
+class Candidate:
+    __slots__ = ("peptide", "mass", "amino_acid_mass", "length", "parent", "_prefix_masses", "_linear_spectrum",
+                 "_internal_spectrum")
+
+    def __init__(self, peptide="", mass=0, parent=None, amino_acid_mass=0):
+        self.peptide = peptide
+        self.mass = mass
+        self.amino_acid_mass = amino_acid_mass
+        self.length = 0 if parent is None else parent.length + 1
+        self.parent = parent
+        self._prefix_masses = None
+        self._linear_spectrum = None
+        self._internal_spectrum = None
+
+    def __len__(self):
+        return self.length
+
+    def extend(self, amino_acid, amino_acid_mass):
+        return Candidate(self.peptide + amino_acid, self.mass + amino_acid_mass, self, amino_acid_mass)
+
+    def extend_by_mass(self, amino_acid_mass):
+        return Candidate(None, self.mass + amino_acid_mass, self, amino_acid_mass)
+
+    @property
+    def amino_acid_masses(self):
+        amino_acid_masses = []
+        peptide = self
+        while peptide.parent is not None:
+            amino_acid_masses.append(peptide.amino_acid_mass)
+            peptide = peptide.parent
+
+        return tuple(reversed(amino_acid_masses))
+
+    def uncached_chain(self, attribute):
+        # Candidates from the nearest ancestor that has the attribute cached (left out) down to this one. Values
+        # are computed along the chain from the top, so long peptides don't recurse once per amino acid.
+        chain = []
+        peptide = self
+        while peptide is not None and getattr(peptide, attribute) is None:
+            chain.append(peptide)
+            peptide = peptide.parent
+
+        chain.reverse()
+        return chain
+
+    @property
+    def prefix_masses(self):
+        if self._prefix_masses is None:
+            for peptide in self.uncached_chain("_prefix_masses"):
+                if peptide.parent is None:
+                    peptide._prefix_masses = [0]
+                else:
+                    peptide._prefix_masses = peptide.parent._prefix_masses + [peptide.mass]
+
+        return self._prefix_masses
+
+    @property
+    def linear_spectrum(self):
+        if self._linear_spectrum is None:
+            for peptide in self.uncached_chain("_linear_spectrum"):
+                if peptide.parent is None:
+                    peptide._linear_spectrum = [0]
+                    continue
+
+                # New fragments are the suffixes that end with the added amino acid, in ascending order
+                parent = peptide.parent
+                new_fragments = [peptide.mass - prefix_mass for prefix_mass in reversed(parent.prefix_masses)]
+                spectrum = parent._linear_spectrum + new_fragments
+                # Both parts are already sorted so the sort only merges two runs in linear time
+                spectrum.sort()
+                peptide._linear_spectrum = spectrum
+
+        return self._linear_spectrum
+
+    @property
+    def internal_spectrum(self):
+        # Fragments that contain neither the first nor the last amino acid of the peptide
+        if self._internal_spectrum is None:
+            for peptide in self.uncached_chain("_internal_spectrum"):
+                if peptide.parent is None:
+                    peptide._internal_spectrum = []
+                    continue
+
+                parent = peptide.parent
+                parent_prefix_masses = parent.prefix_masses
+                new_fragments = [parent.mass - parent_prefix_masses[i] for i in range(len(parent) - 1, 0, -1)]
+                spectrum = parent._internal_spectrum + new_fragments
+                spectrum.sort()
+                peptide._internal_spectrum = spectrum
+
+        return self._internal_spectrum
+
+    @property
+    def cyclic_spectrum(self):
+        # Fragments that wrap around the end of the peptide are complements of the internal fragments
+        wrapped_fragments = [self.mass - fragment for fragment in reversed(self.internal_spectrum)]
+        spectrum = self.linear_spectrum + wrapped_fragments
+        spectrum.sort()
+        return spectrum
@@ -1,47 +1,121 @@
-from .consts import AMINO_ACID_MASSES, AMINO_ACID_BASED_ON_MASSES
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import product
 
+from .alphabet import DEFAULT_ALPHABET
+from .consts import AMINO_ACID_BASED_ON_MASSES
 
-def calculate_peptide_mass(peptide):
-    total_mass = 0
 
-    for aa in peptide:
-        total_mass += AMINO_ACID_MASSES[aa]
+def count_masses(target_spectrum):
+    return Counter(target_spectrum)
 
-    return total_mass
 
+def is_consistent_with_spectrum(peptide, target_spectrum_counts):
+    # Peptides are only extended while they are consistent, so just the fragments that end with the last
+    # amino acid need to be checked. Their masses are all different, so each one has to fit next to the
+    # fragments of the same mass that the parent peptide already has.
+    parent = peptide.parent
 
-def score(peptide_spectrum, target_spectrum):
-    total_score = 0
+    if parent.parent is None and target_spectrum_counts[0] == 0:
+        return False
 
-    i = 0
-    j = 0
-    n = len(peptide_spectrum)
-    m = len(target_spectrum)
+    parent_spectrum = parent.linear_spectrum
+    for prefix_mass in parent.prefix_masses:
+        fragment_mass = peptide.mass - prefix_mass
+        available = target_spectrum_counts[fragment_mass]
+        if available == 0:
+            return False
 
-    while i < n and j < m:
-        if peptide_spectrum[i] == target_spectrum[j]:
-            i += 1
-            j += 1
-            total_score += 1
-        elif peptide_spectrum[i] > target_spectrum[j]:
-            j += 1
-        else:
-            i += 1
+        used = bisect_right(parent_spectrum, fragment_mass) - bisect_left(parent_spectrum, fragment_mass)
+        if used >= available:
+            return False
 
-    return total_score
+    return True
 
 
-def extend(peptides, amino_acid_candidates=AMINO_ACID_MASSES.keys()):
+def extend(peptides, alphabet=DEFAULT_ALPHABET):
     extended_peptides = []
+    letter_masses = alphabet.letter_masses
 
     for peptide in peptides:
-        for amino_acid in amino_acid_candidates:
-            if amino_acid != "":
-                extended_peptides.append(peptide + amino_acid)
+        for amino_acid, amino_acid_mass in letter_masses:
+            extended_peptides.append(peptide.extend(amino_acid, amino_acid_mass))
 
     return extended_peptides
 
 
+def extend_by_mass(peptides, amino_acid_masses, target_mass=None, peptide_counts=None):
+    extended_peptides = []
+
+    for peptide in peptides:
+        for amino_acid_mass in amino_acid_masses:
+            if target_mass is not None:
+                remaining_mass = target_mass - peptide.mass - amino_acid_mass
+                # Peptides heavier than the target, or whose remaining mass can't be made of any amino acids,
+                # are never created since they can't lead to a solution
+                if remaining_mass < 0 or (peptide_counts is not None and peptide_counts[remaining_mass] == 0):
+                    continue
+            extended_peptides.append(peptide.extend_by_mass(amino_acid_mass))
+
+    return extended_peptides
+
+
+def count_peptides_by_mass(max_mass, alphabet=DEFAULT_ALPHABET, max_count=None):
+    # Number of peptides of every integer mass up to max_mass, a mass can be made of the amino acids of the
+    # alphabet only if its count isn't zero. With max_count larger counts are cut down to it, which keeps them small
+    # integers when only whether they pass a limit matters.
+    peptide_counts = [1] + [0] * max_mass
+    amino_acid_masses = list(zip(alphabet.masses, alphabet.multiplicities))
+
+    for mass in range(1, max_mass + 1):
+        for amino_acid_mass, multiplicity in amino_acid_masses:
+            if amino_acid_mass <= mass:
+                peptide_counts[mass] += multiplicity * peptide_counts[mass - amino_acid_mass]
+
+        if max_count is not None and peptide_counts[mass] > max_count:
+            peptide_counts[mass] = max_count
+
+    return peptide_counts
+
+
+def count_peptides(target_mass, alphabet=DEFAULT_ALPHABET):
+    # Number of peptides with the target mass, and number of peptides that can still be extended to the target
+    # mass, which is how many peptides a search that prunes the rest has to visit
+    peptide_counts = count_peptides_by_mass(target_mass, alphabet)
+
+    return {
+        "number_of_peptides": peptide_counts[target_mass],
+        "number_of_prefixes": sum(peptide_counts[mass] for mass in range(target_mass + 1)
+                                  if peptide_counts[target_mass - mass] > 0)
+    }
+
+
+def number_of_peptides(peptide, alphabet=DEFAULT_ALPHABET):
+    total = 1
+    amino_acids_by_mass = alphabet.amino_acids_by_mass
+
+    for amino_acid_mass in peptide.amino_acid_masses:
+        total *= len(amino_acids_by_mass[amino_acid_mass])
+
+    return total
+
+
+def peptides_from_masses(mass_sequences, alphabet=DEFAULT_ALPHABET):
+    # Spells out every peptide that has one of the given sequences of amino acid masses, ordered the same way
+    # as if the peptides were extended one letter at a time
+    amino_acids_by_mass = alphabet.amino_acids_by_mass
+    amino_acid_order = alphabet.letter_order
+
+    result = []
+    for amino_acid_masses in mass_sequences:
+        letters = [amino_acids_by_mass[amino_acid_mass] for amino_acid_mass in amino_acid_masses]
+        for amino_acids in product(*letters):
+            result.append("".join(amino_acids))
+
+    result.sort(key=lambda x: (len(x), [amino_acid_order[amino_acid] for amino_acid in x]))
+    return result
+
+
 def prepare_amino_acids_that_are_candidates(top_masses):
     candidates = ['']
     for element in top_masses:
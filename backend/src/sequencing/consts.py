@@ -22,6 +22,34 @@ AMINO_ACID_MASSES = {
     'W': 186,
 }
 
+# Monoisotopic masses used when the spectrum has real masses that are matched within a tolerance
+MONOISOTOPIC_AMINO_ACID_MASSES = {
+    '': 0,
+    'G': 57.02146,
+    'A': 71.03711,
+    'S': 87.03203,
+    'P': 97.05276,
+    'V': 99.06841,
+    'T': 101.04768,
+    'C': 103.00919,
+    'I': 113.08406,
+    'L': 113.08406,
+    'N': 114.04293,
+    'D': 115.02694,
+    'K': 128.09496,
+    'Q': 128.05858,
+    'E': 129.04259,
+    'M': 131.04049,
+    'H': 137.05891,
+    'F': 147.06841,
+    'R': 156.10111,
+    'Y': 163.06333,
+    'W': 186.07931,
+}
+
+# A tolerance is either in daltons or in parts per million of the mass
+MASS_TOLERANCE_UNITS = ("Da", "ppm")
+
 AMINO_ACID_BASED_ON_MASSES = {
     0: [''],
     57: ['G'],
@@ -45,3 +73,113 @@ AMINO_ACID_BASED_ON_MASSES = {
 }
 
 MAX_NUMBER_OF_CANDIDATES = 20
+
+# Differences of spectrum masses that can be the mass of an amino acid
+MIN_CONVOLUTION_MASS = 57
+MAX_CONVOLUTION_MASS = 200
+
+# Rows of the difference matrix computed at once, so spectra with thousands of masses don't need the whole matrix
+CONVOLUTION_ROWS_PER_BLOCK = 1024
+
+# Longest peptide whose spectrum is served on its own. The spectrum of a cyclic peptide of this length has about
+# 2500 fragments and takes about 0.7 MB, so the cache of spectra holds at most about 90 MB.
+MAX_SPECTRUM_PEPTIDE_LENGTH = 50
+SPECTRUM_CACHE_SIZE = 128
+
+# Number of scores a leaderboard search remembers, so peptides with the same spectrum are only scored once
+SCORE_MEMO_SIZE = 100_000
+
+# Heaviest peptide that is searched for or counted. Counting the peptides of a mass takes longer the heavier the mass
+# is, and the number of peptides of this mass still fits in a double, so clients can parse it.
+MAX_PEPTIDE_MASS = 20_000
+
+# Longest target spectrum that is accepted. A cyclic peptide of 100 amino acids has a spectrum of 9902 masses, and
+# the spectral convolution compares every pair of masses of the spectrum.
+MAX_SPECTRUM_LENGTH = 10_000
+
+# Parallel brute force and branch and bound split the tree into at least this many subtrees per worker,
+# so workers that get small subtrees don't sit idle
+PREFIXES_PER_WORKER = 8
+
+# Work a single request may do. Searches stop after creating max_nodes peptides or after max_seconds and return
+# what they found so far, searches estimated to create more than max_estimated_nodes peptides aren't started.
+SEARCH_BUDGETS = {
+    "brute_force": {"max_nodes": 1_000_000, "max_seconds": 20, "max_estimated_nodes": 100_000_000},
+    "branch_and_bound": {"max_nodes": 1_000_000, "max_seconds": 20, "max_estimated_nodes": 1_000_000_000},
+    "leaderboard": {"max_nodes": 200_000, "max_seconds": 20, "max_estimated_nodes": 1_000_000},
+    "spectral_convolution": {"max_nodes": 200_000, "max_seconds": 20, "max_estimated_nodes": 1_000_000},
+    # Paths of the spectrum graph are counted without the consistency check that drops almost all of them, so only
+    # graphs with an absurd number of paths are refused
+    "spectrum_graph": {"max_nodes": 1_000_000, "max_seconds": 20, "max_estimated_nodes": 10 ** 18},
+}
+
+# Searches estimated to create at most this many peptides are run by the request itself instead of the solver pool
+INLINE_MAX_ESTIMATED_NODES = 1000
+
+# Time given to timed solvers to return what they found after their own time runs out, before they are killed
+TIMEOUT_GRACE_IN_SECONDS = 5
+
+# Outcomes of visiting a peptide during brute force and branch and bound sequencing
+PEPTIDE_EXTENDABLE = 0
+PEPTIDE_SOLUTION = 1
+PEPTIDE_NOT_SOLUTION = 2
+PEPTIDE_INCONSISTENT = 3
+PEPTIDE_TOO_HEAVY = 4
+
+PEPTIDE_STATUS_REASONS = {
+    PEPTIDE_INCONSISTENT: "Teorijski spektar peptida nije konzistentan sa zadatim spektrom.",
+    PEPTIDE_TOO_HEAVY: "Peptid ima preveliku masu i ne može biti rešenje.",
+}
+
+TREE_FORMAT_COLUMNAR = "columnar"
+
+# States of a sequencing job, a job only goes from queued to running and from running to one of the last three
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_FINISHED = "finished"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+JOB_ALGORITHMS = ("brute_force", "branch_and_bound", "leaderboard", "spectral_convolution", "spectrum_graph")
+
+# Number of spectra a single batch request may sequence
+BATCH_MAX_SPECTRA = 1000
+
+# How often a running job saves its progress and checks whether it was cancelled
+JOB_PROGRESS_INTERVAL_IN_SECONDS = 1
+
+# Benchmarks run every algorithm on a synthetic spectrum of a random peptide of every length. Noisy spectra lose
+# a share of their fragments and get a share of random masses. A run that takes this much more time or memory
+# than the baseline is a regression.
+BENCHMARK_ALGORITHMS = ("brute_force", "branch_and_bound", "leaderboard", "leaderboard_without_additional_data",
+                        "spectral_convolution", "spectrum_graph")
+BENCHMARK_PEPTIDE_LENGTHS = (4, 6, 8)
+BENCHMARK_NUMBER_OF_LARGEST_ELEMENTS = 20
+BENCHMARK_MISSING_PEAKS = 0.1
+BENCHMARK_FALSE_PEAKS = 0.1
+BENCHMARK_REGRESSION_THRESHOLD = 0.2
+
+# Fast cases are run again until all of their runs together take at least this long, so their median run isn't noise
+BENCHMARK_MIN_TIME_IN_SECONDS = 0.5
+
+# A metric only regressed if it also grew by more than its noise floor. Timings of fast cases move by a few
+# milliseconds from run to run, which is a large share of a case that takes less than that.
+BENCHMARK_NOISE_FLOORS = {"seconds": 0.005, "peak_memory": 0, "nodes": 0}
+
+# Counters and timers collected by the searches of the visualization endpoints, with their descriptions on the
+# metrics endpoint
+SEARCH_COUNTERS = {
+    "rounds": "Rounds of leaderboard searches.",
+    "levels": "Levels of the tree extended by brute force and branch and bound.",
+    "nodes_generated": "Peptides created by extending other peptides.",
+    "pruned_by_mass": "Peptides dropped or never created because of their mass.",
+    "pruned_by_consistency": "Peptides dropped because they aren't consistent with the spectrum.",
+    "spectra_computed": "Theoretical spectra computed to score or check peptides.",
+}
+
+SEARCH_TIMERS = {
+    "search": "Time spent searching.",
+    "scoring": "Time spent scoring peptides against the spectrum.",
+    "trimming": "Time spent choosing the peptides that stay on the leaderboard.",
+    "serialization": "Time spent serializing responses.",
+}
@@ -0,0 +1,37 @@
+import numpy as np
+
+from .consts import MIN_CONVOLUTION_MASS, MAX_CONVOLUTION_MASS, CONVOLUTION_ROWS_PER_BLOCK
+
+
+def convolution_masses(target_spectrum):
+    # Differences target_spectrum[i] - target_spectrum[j] for j < i that can be the mass of an amino acid, in the
+    # order of the pairs (i first, then j)
+    spectrum = np.asarray(target_spectrum)
+    blocks = []
+
+    for start in range(0, len(spectrum), CONVOLUTION_ROWS_PER_BLOCK):
+        rows = np.arange(start, min(start + CONVOLUTION_ROWS_PER_BLOCK, len(spectrum)))
+        differences = np.subtract.outer(spectrum[rows], spectrum[:rows[-1]])
+        kept = ((np.arange(rows[-1])[None, :] < rows[:, None]) &
+                (differences >= MIN_CONVOLUTION_MASS) & (differences <= MAX_CONVOLUTION_MASS))
+        blocks.append(differences[kept])
+
+    return np.concatenate(blocks) if len(blocks) > 0 else spectrum[:0]
+
+
+def spectral_convolution(target_spectrum, number_of_largest_elements):
+    # Masses of the convolution with their number of occurrences from the most frequent one, masses that occur
+    # equally often keep the order in which they first appear. The top masses are the number_of_largest_elements
+    # most frequent ones together with all masses tied with the last of them.
+    masses = convolution_masses(target_spectrum)
+    unique_masses, first_occurrences, counts = np.unique(masses, return_index=True, return_counts=True)
+    order = np.lexsort((first_occurrences, -counts))
+
+    sorted_masses = list(zip(unique_masses[order].tolist(), counts[order].tolist()))
+    if number_of_largest_elements > len(sorted_masses):
+        top_masses = [mass for mass, _ in sorted_masses]
+    else:
+        number_of_showing = sorted_masses[number_of_largest_elements - 1][1]
+        top_masses = [mass for mass, num in sorted_masses if number_of_showing <= num]
+
+    return sorted_masses, top_masses
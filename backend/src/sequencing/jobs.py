@@ -0,0 +1,182 @@
+import time
+from functools import lru_cache
+from uuid import uuid4
+
+from django.conf import settings
+from django.utils import timezone
+
+from .alphabet import alphabet_for
+from .budget import Budget
+from .consts import (JOB_QUEUED, JOB_RUNNING, JOB_FINISHED, JOB_FAILED, JOB_CANCELLED,
+                     JOB_PROGRESS_INTERVAL_IN_SECONDS)
+from .models import Job
+from .offload import shared_state_manager, worker_pool
+from .tolerance import parse_tolerance
+from .utils_for_timed_execution import (brute_force_sequencing, branch_and_bound_sequencing,
+                                        leaderboard_sequencing_without_additional_data, convolution_sequencing,
+                                        spectrum_graph_sequencing)
+
+
+# Budget of a running job. Every JOB_PROGRESS_INTERVAL_IN_SECONDS it saves how far the search got and checks
+# whether the job was cancelled in the meantime, in which case the search stops.
+# Steps are rounds for leaderboard and extended peptides for brute force and branch and bound.
+# Parts of the search that run in other processes report their nodes to a shared dictionary and stop once the shared
+# cancel event is set. Both live in a manager process that is started with the first part and stopped by close.
+class JobBudget(Budget):
+    CHECK_INTERVAL_IN_SECONDS = JOB_PROGRESS_INTERVAL_IN_SECONDS
+
+    def __init__(self, job_id, max_seconds=None):
+        super().__init__(max_seconds=max_seconds)
+        self.job_id = job_id
+        self.number_of_steps = 0
+        self.next_report = time.monotonic() + JOB_PROGRESS_INTERVAL_IN_SECONDS
+        self.cancelled = False
+        self.manager = None
+        self.parts = None
+        self.cancel = None
+
+    @property
+    def progress(self):
+        number_of_nodes = self.number_of_nodes
+        if self.parts is not None:
+            # Nodes of the parts that are still searched
+            number_of_nodes += sum(self.parts.values())
+
+        return {
+            "nodes": number_of_nodes,
+            "steps": self.number_of_steps
+        }
+
+    def spend(self, number_of_nodes):
+        self.number_of_steps += 1
+        return self.check() and super().spend(number_of_nodes)
+
+    def check(self):
+        if time.monotonic() >= self.next_report:
+            self.next_report = time.monotonic() + JOB_PROGRESS_INTERVAL_IN_SECONDS
+            self.report()
+
+        return not self.cancelled
+
+    def split(self, number_of_parts, part=None):
+        if self.manager is None:
+            self.manager = shared_state_manager()
+            self.parts = self.manager.dict()
+            self.cancel = self.manager.Event()
+
+        return super().split(number_of_parts, JobPartBudget(self.parts, self.cancel))
+
+    def merge(self, part):
+        super().merge(part)
+        # The nodes of the part are counted by this budget from now on
+        self.parts.pop(part.key, None)
+
+    def report(self):
+        running = Job.objects.filter(pk=self.job_id, status=JOB_RUNNING)
+        if running.update(progress=self.progress, updated_at=timezone.now()) == 0:
+            self.cancelled = True
+            if self.cancel is not None:
+                self.cancel.set()
+
+    def close(self):
+        if self.manager is not None:
+            self.manager.shutdown()
+            self.manager = None
+            self.parts = None
+            self.cancel = None
+
+
+# Budget of a part of a job that is searched in another process. Every copy of the part sent to a worker saves its
+# nodes under its own key every JOB_PROGRESS_INTERVAL_IN_SECONDS and stops once the job is cancelled.
+class JobPartBudget(Budget):
+
+    def __init__(self, parts, cancel):
+        super().__init__()
+        self.parts = parts
+        self.cancel = cancel
+        self.key = None
+        self.next_report = time.monotonic() + JOB_PROGRESS_INTERVAL_IN_SECONDS
+
+    def spend(self, number_of_nodes):
+        if time.monotonic() >= self.next_report:
+            self.next_report = time.monotonic() + JOB_PROGRESS_INTERVAL_IN_SECONDS
+            if self.key is None:
+                self.key = uuid4().hex
+            self.parts[self.key] = self.number_of_nodes
+
+            if self.cancel.is_set():
+                self.truncated = True
+
+        return super().spend(number_of_nodes)
+
+
+def solve(algorithm, target_spectrum, parameters, budget, max_workers=1, peptide_counts=None):
+    # peptide_counts can be given by callers that already counted the peptides of the default alphabet up to at
+    # least the target mass, it is only used by searches with integer masses
+    if algorithm == "brute_force":
+        return brute_force_sequencing(target_spectrum, max_workers=max_workers, budget=budget,
+                                      peptide_counts=peptide_counts)
+    if algorithm == "branch_and_bound":
+        return branch_and_bound_sequencing(target_spectrum, max_workers=max_workers, budget=budget,
+                                           peptide_counts=peptide_counts)
+    if algorithm == "leaderboard":
+        tolerance = parse_tolerance(parameters)
+        return leaderboard_sequencing_without_additional_data(target_spectrum, alphabet_for(tolerance), budget,
+                                                              tolerance, peptide_counts)
+    if algorithm == "spectrum_graph":
+        return spectrum_graph_sequencing(target_spectrum, budget)
+
+    return convolution_sequencing(target_spectrum, parameters["number_of_largest_elements"], budget)
+
+
+def run_job(job_id):
+    queued = Job.objects.filter(pk=job_id, status=JOB_QUEUED)
+    if queued.update(status=JOB_RUNNING, updated_at=timezone.now()) == 0:
+        # The job was cancelled while it was waiting
+        return
+
+    job = Job.objects.get(pk=job_id)
+    budget = JobBudget(job_id, settings.SEQUENCING_JOB_MAX_SECONDS)
+    running = Job.objects.filter(pk=job_id, status=JOB_RUNNING)
+
+    try:
+        result = solve(job.algorithm, job.target_spectrum, job.parameters, budget,
+                       settings.SEQUENCING_JOB_SEARCH_WORKERS)
+    except Exception as error:
+        running.update(status=JOB_FAILED, progress=budget.progress, error=str(error), updated_at=timezone.now())
+        return
+    finally:
+        budget.close()
+
+    # A job cancelled during the search keeps its cancelled status and gets no result
+    running.update(status=JOB_FINISHED, progress=budget.progress, result=result, updated_at=timezone.now())
+
+
+@lru_cache(maxsize=None)
+def job_executor():
+    return worker_pool(settings.SEQUENCING_JOB_WORKERS)
+
+
+def submit_job(algorithm, target_spectrum, parameters):
+    job = Job.objects.create(algorithm=algorithm, target_spectrum=target_spectrum, parameters=parameters)
+    job_executor().submit(run_job, job.id)
+    return job
+
+
+def cancel_job(job):
+    unfinished = Job.objects.filter(pk=job.pk, status__in=[JOB_QUEUED, JOB_RUNNING])
+    unfinished.update(status=JOB_CANCELLED, updated_at=timezone.now())
+    job.refresh_from_db()
+
+
+def job_response(job):
+    return {
+        "id": job.id,
+        "algorithm": job.algorithm,
+        "status": job.status,
+        "progress": job.progress,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at
+    }
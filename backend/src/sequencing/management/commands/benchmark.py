@@ -0,0 +1,78 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sequencing.benchmarks.runner import benchmark_spectra, compare, run_benchmarks
+from sequencing.consts import (BENCHMARK_ALGORITHMS, BENCHMARK_PEPTIDE_LENGTHS, BENCHMARK_MISSING_PEAKS,
+                               BENCHMARK_FALSE_PEAKS, BENCHMARK_REGRESSION_THRESHOLD)
+
+
+class Command(BaseCommand):
+    help = "Runs the sequencing algorithms on synthetic spectra and compares the results with a saved baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--baseline", default="benchmark_baseline.json", help="JSON file with the baseline")
+        parser.add_argument("--save", action="store_true", help="Save the results as the new baseline")
+        parser.add_argument("--algorithms", nargs="+", choices=BENCHMARK_ALGORITHMS, default=BENCHMARK_ALGORITHMS)
+        parser.add_argument("--lengths", nargs="+", type=int, default=BENCHMARK_PEPTIDE_LENGTHS,
+                            help="Lengths of the random peptides")
+        parser.add_argument("--linear", action="store_true", help="Use linear instead of cyclic spectra")
+        parser.add_argument("--missing-peaks", type=float, default=BENCHMARK_MISSING_PEAKS,
+                            help="Share of fragments missing from noisy spectra")
+        parser.add_argument("--false-peaks", type=float, default=BENCHMARK_FALSE_PEAKS,
+                            help="Share of random masses added to noisy spectra")
+        parser.add_argument("--repeat", type=int, default=3, help="Smallest number of timed runs of every case")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--threshold", type=float, default=BENCHMARK_REGRESSION_THRESHOLD,
+                            help="Relative growth of a metric that counts as a regression")
+
+    def handle(self, *args, **options):
+        settings = {
+            "lengths": list(options["lengths"]),
+            "cyclic": not options["linear"],
+            "missing_peaks": options["missing_peaks"],
+            "false_peaks": options["false_peaks"],
+            "seed": options["seed"]
+        }
+        spectra = benchmark_spectra(settings["lengths"], settings["cyclic"], settings["missing_peaks"],
+                                    settings["false_peaks"], settings["seed"])
+
+        results = {}
+        for case, result in run_benchmarks(options["algorithms"], spectra, options["repeat"]):
+            truncated = " (truncated)" if result["truncated"] else ""
+            self.stdout.write(f"{case:48} {result['seconds']:9.4f} s {result['peak_memory'] / 1024:10.0f} KiB "
+                              f"{result['nodes']:9} nodes {result['solutions']:4} solutions{truncated}")
+            results[case] = result
+
+        if options["save"]:
+            with open(options["baseline"], "w") as baseline_file:
+                json.dump({"settings": settings, "results": results}, baseline_file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {options['baseline']}"))
+            return
+
+        if not os.path.exists(options["baseline"]):
+            self.stdout.write(self.style.WARNING(f"There is no baseline at {options['baseline']}, run with --save "
+                                                 f"to create it"))
+            return
+
+        with open(options["baseline"]) as baseline_file:
+            baseline = json.load(baseline_file)
+
+        if baseline["settings"] != settings:
+            self.stdout.write(self.style.WARNING("The baseline was made with different settings, its spectra differ"))
+
+        changes = compare(baseline["results"], results, options["threshold"])
+        for change in changes:
+            line = (f"{change['case']:48} {change['metric']:12} {change['baseline']:>14.6g} -> "
+                    f"{change['current']:<14.6g} {change['change']:+8.1%}")
+            if change["regression"]:
+                self.stdout.write(self.style.ERROR(line))
+            elif change["change"] < -options["threshold"]:
+                self.stdout.write(self.style.SUCCESS(line))
+            else:
+                self.stdout.write(line)
+
+        regressions = [change for change in changes if change["regression"]]
+        if len(regressions) > 0:
+            raise CommandError(f"{len(regressions)} metrics regressed by more than {options['threshold']:.0%}")
@@ -1,3 +1,26 @@
+import uuid
+
 from django.db import models
 
-# Create your models here.
+from .consts import JOB_QUEUED, JOB_RUNNING, JOB_FINISHED, JOB_FAILED, JOB_CANCELLED
+
+
+class Job(models.Model):
+    STATUSES = [
+        (JOB_QUEUED, "Queued"),
+        (JOB_RUNNING, "Running"),
+        (JOB_FINISHED, "Finished"),
+        (JOB_FAILED, "Failed"),
+        (JOB_CANCELLED, "Cancelled"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    algorithm = models.CharField(max_length=32)
+    target_spectrum = models.JSONField()
+    parameters = models.JSONField(default=dict)
+    status = models.CharField(max_length=16, choices=STATUSES, default=JOB_QUEUED)
+    progress = models.JSONField(default=dict)
+    result = models.JSONField(null=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,135 @@
+from .alphabet import DEFAULT_ALPHABET
+from .consts import (PEPTIDE_EXTENDABLE, PEPTIDE_SOLUTION, PEPTIDE_NOT_SOLUTION, PEPTIDE_INCONSISTENT,
+                     PEPTIDE_TOO_HEAVY, PEPTIDE_STATUS_REASONS, TREE_FORMAT_COLUMNAR)
+from .utils import spectrum_with_subpeptides
+
+
+# Builds the tree of all visited peptides that the brute force and branch and bound visualizations show.
+# With mark_candidates every finished peptide is also marked whether it is a solution, and pruned peptides
+# get the reason why they were pruned.
+class TreeObserver:
+
+    def __init__(self, mark_candidates=False):
+        self.mark_candidates = mark_candidates
+        self.results = {}
+        self.tree = {
+            "Root": {
+                "node": "Root",
+                "mass": 0,
+                "children": [],
+                "end": False
+            }
+        }
+
+        if mark_candidates:
+            self.tree["Root"]["candidate"] = False
+
+    def extended(self, peptides):
+        for peptide in peptides:
+            self.tree[peptide.peptide] = {
+                "node": peptide.peptide,
+                "children": [],
+                "end": False
+            }
+
+            if peptide.parent.peptide == "":
+                self.tree["Root"]["children"].append(peptide.peptide)
+            else:
+                self.tree[peptide.parent.peptide]["children"].append(peptide.peptide)
+
+    def visited(self, peptide, status):
+        node = self.tree[peptide.peptide]
+        node["mass"] = peptide.mass
+
+        if status == PEPTIDE_SOLUTION:
+            node["end"] = True
+            self.results[peptide.peptide] = spectrum_with_subpeptides(peptide, cyclic=True)
+            if self.mark_candidates:
+                node["candidate"] = True
+        elif status == PEPTIDE_NOT_SOLUTION:
+            node["end"] = True
+            if self.mark_candidates:
+                node["candidate"] = False
+        elif status == PEPTIDE_INCONSISTENT:
+            node["end"] = True
+            node["candidate"] = False
+            node["reason"] = PEPTIDE_STATUS_REASONS[PEPTIDE_INCONSISTENT]
+        elif status == PEPTIDE_TOO_HEAVY:
+            node["end"] = True
+            if self.mark_candidates:
+                node["candidate"] = False
+                node["reason"] = PEPTIDE_STATUS_REASONS[PEPTIDE_TOO_HEAVY]
+
+
+# Same tree as TreeObserver, but sent as parallel arrays instead of a dictionary keyed by peptides. Node i has
+# parent parent[i] (-1 for the root), was extended by amino_acids[amino_acid[i]] and has the given mass and status.
+# Reasons for the statuses are sent once in a lookup table instead of being repeated in every pruned node.
+# When the tree is streamed, flush returns the nodes added since the previous flush (indices stay global).
+class ColumnarTreeObserver:
+
+    def __init__(self):
+        self.results = {}
+        self.amino_acids = list(DEFAULT_ALPHABET.letters)
+        self.amino_acid_codes = {amino_acid: code for code, amino_acid in enumerate(self.amino_acids)}
+        self.first_index = 0
+        self.parent = [-1]
+        self.amino_acid = [-1]
+        self.mass = [0]
+        self.status = [PEPTIDE_EXTENDABLE]
+        # Peptides are extended level by level, so only indices of the last level are needed to link children
+        self.level_indices = {}
+
+    def extended(self, peptides):
+        level_indices = {}
+
+        for peptide in peptides:
+            level_indices[id(peptide)] = self.first_index + len(self.parent)
+            self.parent.append(self.level_indices.get(id(peptide.parent), 0))
+            self.amino_acid.append(self.amino_acid_codes[peptide.peptide[-1]])
+            self.mass.append(peptide.mass)
+            self.status.append(PEPTIDE_EXTENDABLE)
+
+        self.level_indices = level_indices
+
+    def visited(self, peptide, status):
+        self.status[self.level_indices[id(peptide)] - self.first_index] = status
+
+        if status == PEPTIDE_SOLUTION:
+            self.results[peptide.peptide] = spectrum_with_subpeptides(peptide, cyclic=True)
+
+    @property
+    def tree(self):
+        return {
+            "format": TREE_FORMAT_COLUMNAR,
+            "amino_acids": self.amino_acids,
+            "parent": self.parent,
+            "amino_acid": self.amino_acid,
+            "mass": self.mass,
+            "status": self.status,
+            "reasons": PEPTIDE_STATUS_REASONS
+        }
+
+    def flush(self):
+        nodes = {
+            "first": self.first_index,
+            "parent": self.parent,
+            "amino_acid": self.amino_acid,
+            "mass": self.mass,
+            "status": self.status,
+            "candidates": self.results
+        }
+
+        self.first_index += len(self.parent)
+        self.results = {}
+        self.parent = []
+        self.amino_acid = []
+        self.mass = []
+        self.status = []
+        return nodes
+
+
+def create_tree_observer(tree_format, mark_candidates=False):
+    if tree_format == TREE_FORMAT_COLUMNAR:
+        return ColumnarTreeObserver()
+
+    return TreeObserver(mark_candidates)
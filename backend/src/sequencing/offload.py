@@ -0,0 +1,117 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from json import dumps
+from multiprocessing import get_context
+from multiprocessing.managers import SyncManager
+from threading import BoundedSemaphore, Thread
+
+import django
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .consts import INLINE_MAX_ESTIMATED_NODES
+from .stats import METRICS
+
+
+def exit_with_parent(parent_pid):
+    while os.getppid() == parent_pid:
+        time.sleep(1)
+
+    os._exit(0)
+
+
+def start_worker(parent_pid):
+    # Workers are started fresh instead of forked from the server, so they set up Django on their own. The server
+    # process can be stopped by a signal without shutting its pools down, so workers also leave once it is gone.
+    django.setup()
+    Thread(target=exit_with_parent, args=(parent_pid,), daemon=True).start()
+
+
+def worker_pool(max_workers):
+    return ProcessPoolExecutor(max_workers, mp_context=get_context("spawn"), initializer=start_worker,
+                               initargs=(os.getpid(),))
+
+
+def shared_state_manager():
+    # Process that holds objects shared by a process and its workers, it leaves once its parent is gone like they do
+    manager = SyncManager(ctx=get_context("spawn"))
+    manager.start(start_worker, (os.getpid(),))
+    return manager
+
+
+@lru_cache(maxsize=None)
+def solver_executor():
+    # Bounded pool shared by all requests of the server process, heavy searches wait for a free worker instead of
+    # taking over the process that serves requests
+    return worker_pool(settings.SEQUENCING_SOLVER_WORKERS)
+
+
+@lru_cache(maxsize=None)
+def timed_execution_slots():
+    # Every timed run starts a process for each solver, so a server process only runs SEQUENCING_TIMED_EXECUTIONS
+    # of them at a time
+    return BoundedSemaphore(settings.SEQUENCING_TIMED_EXECUTIONS)
+
+
+def serialized(solver, budget, with_stats, *args):
+    # The response is serialized in the worker as well, so the event loop only has to send the bytes. Stats of the
+    # search are sent back with it, since the worker has its own copy of the budget.
+    stats = budget.stats
+    with stats.timer("search"):
+        response = solver(*args, budget)
+
+    if with_stats:
+        response["stats"] = stats.summary()
+
+    with stats.timer("serialization"):
+        content = dumps(response).encode()
+
+    return content, response["truncated"], stats
+
+
+async def solve(budget, solver, *args, with_stats=False):
+    # Searches estimated to be small are answered right away, sending them to the pool would take longer
+    if budget.estimated_nodes <= INLINE_MAX_ESTIMATED_NODES:
+        content, truncated, stats = serialized(solver, budget, with_stats, *args)
+    else:
+        loop = asyncio.get_running_loop()
+        content, truncated, stats = await loop.run_in_executor(solver_executor(), serialized, solver, budget,
+                                                               with_stats, *args)
+
+    METRICS.record(stats)
+    headers = {}
+
+    server_timing = stats.server_timing()
+    if server_timing:
+        headers["Server-Timing"] = server_timing
+
+    if truncated or with_stats:
+        # Where a search stops depends on how fast it was, so truncated results shouldn't be served from the cache
+        # later, and neither should stats that describe this one search
+        headers["Cache-Control"] = "no-store"
+
+    return HttpResponse(content, content_type="application/json", headers=headers)
+
+
+async def lines_in_thread(lines):
+    # Every line is produced in a worker thread, so the event loop keeps serving other requests during the search
+    next_line = sync_to_async(next, thread_sensitive=False)
+
+    while True:
+        line = await next_line(lines, None)
+        if line is None:
+            return
+        yield line
+
+
+def ndjson_response(request, events):
+    lines = (dumps(event) + "\n" for event in events)
+    if isinstance(request, ASGIRequest):
+        lines = lines_in_thread(lines)
+
+    return StreamingHttpResponse(lines, content_type="application/x-ndjson")
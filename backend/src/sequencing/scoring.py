@@ -0,0 +1,122 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from .consts import SCORE_MEMO_SIZE
+from .tolerance import SpectrumIndex, same_mass
+
+
+def fragment_masses(peptides, cyclic=False):
+    # One row per peptide (all of the same length) with the masses of all of its fragments, including the empty one.
+    # Masses stay integers unless the peptides were built from real masses.
+    prefix_masses = np.array([peptide.prefix_masses for peptide in peptides])
+    n = prefix_masses.shape[1] - 1
+
+    start, end = np.triu_indices(n + 1, k=1)
+    fragments = prefix_masses[:, end] - prefix_masses[:, start]
+    columns = [np.zeros((len(peptides), 1), dtype=prefix_masses.dtype), fragments]
+
+    if cyclic:
+        wraps_around = (start > 0) & (end < n)
+        columns.append(prefix_masses[:, -1:] - fragments[:, wraps_around])
+
+    return np.hstack(columns)
+
+
+def count_matches(fragments, target_spectrum):
+    target_counts = np.bincount(np.asarray(target_spectrum, dtype=np.int64))
+    # Every mass outside of the target spectrum range is counted as the extra mass that has no occurrences
+    outside_of_spectrum = len(target_counts)
+    target_counts = np.append(target_counts, 0)
+    fragments = np.where((fragments >= 0) & (fragments < outside_of_spectrum), fragments, outside_of_spectrum)
+
+    number_of_rows, number_of_columns = fragments.shape
+    fragments = np.sort(fragments, axis=1)
+    keys = (fragments + np.arange(number_of_rows, dtype=np.int64)[:, None] * len(target_counts)).ravel()
+
+    # A fragment is matched if fewer fragments with the same mass came before it than the target spectrum has,
+    # which gives the same number of matches as merging the two sorted spectra
+    occurrence = np.arange(keys.size) - np.searchsorted(keys, keys)
+    matches = occurrence < target_counts[fragments.ravel()]
+
+    return matches.reshape(number_of_rows, number_of_columns).sum(axis=1)
+
+
+def batch_score(peptides, target_spectrum, cyclic=False, tolerance=None):
+    # Without a tolerance masses are integers and have to be the same to match
+    scores = [0] * len(peptides)
+    spectrum_index = None if tolerance is None else SpectrumIndex(target_spectrum, tolerance)
+
+    indices_by_length = {}
+    for index, peptide in enumerate(peptides):
+        indices_by_length.setdefault(len(peptide), []).append(index)
+
+    for indices in indices_by_length.values():
+        fragments = fragment_masses([peptides[index] for index in indices], cyclic)
+        if spectrum_index is None:
+            matches = count_matches(fragments, target_spectrum)
+        else:
+            matches = spectrum_index.count_matches(fragments)
+
+        for index, peptide_score in zip(indices, matches.tolist()):
+            scores[index] = peptide_score
+
+    return scores
+
+
+def memo_key(peptide, cyclic, target_peptide_mass, tolerance):
+    # Prefix masses stand for the sequence of amino acid masses, and the candidate already keeps them
+    if not cyclic or not same_mass(peptide.mass, target_peptide_mass, tolerance):
+        return cyclic, tuple(peptide.prefix_masses)
+
+    # Rotations of a peptide have the same cyclic spectrum and show up once peptides reach the target mass, so those
+    # peptides are kept by the smallest rotation of their amino acid masses. Any rotation gives the same score, so
+    # it doesn't matter that other peptides are kept by their prefix masses, which always start with 0.
+    amino_acid_masses = peptide.amino_acid_masses
+    return cyclic, min(amino_acid_masses[i:] + amino_acid_masses[:i] for i in range(len(amino_acid_masses)))
+
+
+# Scores of the peptides of a single search, against one spectrum with one tolerance. Linear scores are kept by the
+# sequence of amino acid masses, so peptides spelled with different letters of the same mass share them, and cyclic
+# scores of peptides with the target mass by the smallest rotation of that sequence. Only the max_size most
+# recently used scores are kept.
+class ScoreMemo:
+
+    def __init__(self, max_size=SCORE_MEMO_SIZE):
+        self.max_size = max_size
+        self.scores = OrderedDict()
+
+    def batch_score(self, peptides, target_spectrum, cyclic=False, tolerance=None):
+        target_peptide_mass = target_spectrum[-1]
+        keys = [memo_key(peptide, cyclic, target_peptide_mass, tolerance) for peptide in peptides]
+
+        # Every score that isn't known yet is computed once, for the first peptide that has it
+        missing = {}
+        for key, peptide in zip(keys, peptides):
+            if key in self.scores:
+                self.scores.move_to_end(key)
+            elif key not in missing:
+                missing[key] = peptide
+
+        new_scores = dict(zip(missing, batch_score(list(missing.values()), target_spectrum, cyclic, tolerance)))
+        scores = [new_scores[key] if key in new_scores else self.scores[key] for key in keys]
+
+        self.scores.update(new_scores)
+        while len(self.scores) > self.max_size:
+            self.scores.popitem(last=False)
+
+        return scores
+
+
+def batch_linear_score(peptides, target_spectrum, tolerance=None, memo=None):
+    if memo is not None:
+        return memo.batch_score(peptides, target_spectrum, tolerance=tolerance)
+
+    return batch_score(peptides, target_spectrum, tolerance=tolerance)
+
+
+def batch_cyclic_score(peptides, target_spectrum, tolerance=None, memo=None):
+    if memo is not None:
+        return memo.batch_score(peptides, target_spectrum, cyclic=True, tolerance=tolerance)
+
+    return batch_score(peptides, target_spectrum, cyclic=True, tolerance=tolerance)
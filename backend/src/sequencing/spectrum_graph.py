@@ -0,0 +1,40 @@
+from .alphabet import DEFAULT_ALPHABET
+
+
+def spectrum_graph(target_spectrum, alphabet=DEFAULT_ALPHABET):
+    # Nodes are the masses of the spectrum and the empty peptide, an edge goes from a mass to a heavier one when they
+    # differ by the mass of an amino acid. Every prefix of a solution ends at a mass of its cyclic spectrum, so every
+    # solution is a path from 0 to the target mass. Masses from which the target mass can't be reached are left out.
+    target_peptide_mass = target_spectrum[-1]
+    masses = sorted({0, *(mass for mass in target_spectrum if 0 <= mass <= target_peptide_mass)})
+    spectrum_masses = set(masses)
+
+    graph = {}
+    for mass in reversed(masses):
+        if mass == target_peptide_mass:
+            graph[mass] = []
+            continue
+
+        next_masses = [mass + amino_acid_mass for amino_acid_mass in alphabet.masses
+                       if mass + amino_acid_mass in spectrum_masses and mass + amino_acid_mass in graph]
+        if len(next_masses) > 0:
+            graph[mass] = next_masses
+
+    return {mass: graph[mass] for mass in masses if mass in graph}
+
+
+def count_paths(graph, max_count=None):
+    # Number of paths from 0 to every mass of the graph, masses are visited from the lightest one. With max_count
+    # larger counts are cut down to it.
+    paths = {mass: 0 for mass in graph}
+    if 0 in paths:
+        paths[0] = 1
+
+    for mass, next_masses in graph.items():
+        if max_count is not None and paths[mass] > max_count:
+            paths[mass] = max_count
+
+        for next_mass in next_masses:
+            paths[next_mass] += paths[mass]
+
+    return paths
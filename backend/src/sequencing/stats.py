@@ -0,0 +1,118 @@
+import time
+from contextlib import contextmanager, nullcontext
+from threading import Lock
+
+from .consts import SEARCH_COUNTERS, SEARCH_TIMERS
+
+
+# Counters and timings of a single search. Solvers count whole batches of peptides and time whole parts of a round,
+# so collecting them costs a few calls per round.
+class SearchStats:
+
+    def __init__(self, algorithm=None):
+        self.algorithm = algorithm
+        self.counters = {}
+        self.seconds = {}
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0) + time.perf_counter() - start
+
+    def split(self):
+        # Empty stats for a part of the search that runs in another process, merged back when the part is done
+        return SearchStats(self.algorithm)
+
+    def merge(self, other):
+        for name, value in other.counters.items():
+            self.count(name, value)
+        for name, value in other.seconds.items():
+            self.seconds[name] = self.seconds.get(name, 0) + value
+
+    def summary(self):
+        return {
+            "counters": dict(self.counters),
+            "seconds": {name: round(value, 6) for name, value in self.seconds.items()}
+        }
+
+    def server_timing(self):
+        return ", ".join(f"{name};dur={value * 1000:.3f}" for name, value in self.seconds.items())
+
+
+# Stats of a search that isn't instrumented, nothing is collected
+class NoStats:
+    algorithm = None
+
+    def count(self, name, value=1):
+        pass
+
+    def timer(self, name):
+        return nullcontext()
+
+    def split(self):
+        return self
+
+    def merge(self, other):
+        pass
+
+    def summary(self):
+        return None
+
+    def server_timing(self):
+        return None
+
+
+NO_STATS = NoStats()
+
+
+# Totals of all searches answered by this server process, every gunicorn worker keeps its own
+class MetricsRegistry:
+
+    def __init__(self):
+        self.lock = Lock()
+        self.searches = {}
+        self.counters = {}
+        self.seconds = {}
+
+    def record(self, stats):
+        if stats.algorithm is None:
+            return
+
+        with self.lock:
+            self.searches[stats.algorithm] = self.searches.get(stats.algorithm, 0) + 1
+            for name, value in stats.counters.items():
+                key = (name, stats.algorithm)
+                self.counters[key] = self.counters.get(key, 0) + value
+            for name, value in stats.seconds.items():
+                key = (name, stats.algorithm)
+                self.seconds[key] = self.seconds.get(key, 0) + value
+
+    def prometheus(self):
+        # Prometheus text format, one counter family per counter and timer of the searches
+        with self.lock:
+            families = [("sequencing_searches_total", "Searches run by the sequencing endpoints.",
+                         dict(self.searches))]
+            for name, description in SEARCH_COUNTERS.items():
+                samples = {algorithm: value for (key, algorithm), value in self.counters.items() if key == name}
+                families.append((f"sequencing_{name}_total", description, samples))
+            for name, description in SEARCH_TIMERS.items():
+                samples = {algorithm: value for (key, algorithm), value in self.seconds.items() if key == name}
+                families.append((f"sequencing_{name}_seconds_total", description, samples))
+
+        lines = []
+        for metric, description, samples in families:
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} counter")
+            for algorithm, value in sorted(samples.items()):
+                lines.append(f'{metric}{{algorithm="{algorithm}"}} {value}')
+
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
@@ -0,0 +1,82 @@
+import random
+
+from django.test import SimpleTestCase
+
+from .candidate import Candidate
+from .consts import AMINO_ACID_MASSES
+from .scoring import batch_cyclic_score, batch_linear_score, ScoreMemo
+
+
+def spectrum(amino_acid_masses, cyclic):
+    # Masses of all fragments of the peptide, including the empty one, sorted
+    n = len(amino_acid_masses)
+    peptide_mass = sum(amino_acid_masses)
+    masses = [0]
+
+    for start in range(n):
+        for end in range(start + 1, n + 1):
+            fragment_mass = sum(amino_acid_masses[start:end])
+            masses.append(fragment_mass)
+            if cyclic and start > 0 and end < n:
+                masses.append(peptide_mass - fragment_mass)
+
+    return sorted(masses)
+
+
+def score(peptide_spectrum, target_spectrum):
+    # Number of masses the two sorted spectra have in common, found by walking through both at once
+    total_score = 0
+    i = 0
+    j = 0
+    n = len(peptide_spectrum)
+    m = len(target_spectrum)
+
+    while i < n and j < m:
+        if peptide_spectrum[i] == target_spectrum[j]:
+            i += 1
+            j += 1
+            total_score += 1
+        elif peptide_spectrum[i] > target_spectrum[j]:
+            j += 1
+        else:
+            i += 1
+
+    return total_score
+
+
+class BatchScoreTests(SimpleTestCase):
+
+    def setUp(self):
+        rng = random.Random(0)
+        amino_acids = sorted(AMINO_ACID_MASSES)
+
+        # Peptides of different lengths are scored in different groups, so a few lengths are mixed together
+        self.peptides = []
+        for length in [1, 2, 3, 3, 4, 5, 5, 6, 8, 8, 10]:
+            candidate = Candidate()
+            for amino_acid in rng.choices(amino_acids, k=length):
+                candidate = candidate.extend(amino_acid, AMINO_ACID_MASSES[amino_acid])
+            self.peptides.append(candidate)
+
+        # The spectrum of one of the peptides with some masses missing, some added and one repeated
+        target_spectrum = spectrum(self.peptides[-1].amino_acid_masses, cyclic=True)
+        target_spectrum = [mass for mass in target_spectrum if rng.random() > 0.2]
+        target_spectrum += [rng.randint(57, target_spectrum[-1]) for _ in range(10)] + [target_spectrum[3]]
+        self.target_spectrum = sorted(target_spectrum)
+
+    def expected_scores(self, cyclic):
+        return [score(spectrum(peptide.amino_acid_masses, cyclic), self.target_spectrum) for peptide in self.peptides]
+
+    def test_linear_score(self):
+        self.assertEqual(batch_linear_score(self.peptides, self.target_spectrum), self.expected_scores(False))
+
+    def test_cyclic_score(self):
+        self.assertEqual(batch_cyclic_score(self.peptides, self.target_spectrum), self.expected_scores(True))
+
+    def test_memo_gives_the_same_scores(self):
+        memo = ScoreMemo()
+        for _ in range(2):
+            self.assertEqual(batch_linear_score(self.peptides, self.target_spectrum, memo=memo),
+                             self.expected_scores(False))
+            self.assertEqual(batch_cyclic_score(self.peptides, self.target_spectrum, memo=memo),
+                             self.expected_scores(True))
@@ -0,0 +1,72 @@
+import numpy as np
+
+from .consts import MASS_TOLERANCE_UNITS
+
+
+# Largest difference at which two masses are still taken to be the same, in daltons or in parts per million of
+# the mass
+class MassTolerance:
+
+    def __init__(self, value, unit="Da"):
+        self.value = value
+        self.unit = unit
+
+    def window(self, masses):
+        if self.unit == "ppm":
+            return abs(masses) * self.value * 1e-6
+
+        return self.value
+
+    def matches(self, mass, target_mass):
+        return abs(mass - target_mass) <= self.window(mass)
+
+
+def same_mass(mass, target_mass, tolerance):
+    if tolerance is None:
+        return mass == target_mass
+
+    return tolerance.matches(mass, target_mass)
+
+
+def parse_tolerance(options):
+    # Tolerance given by the "tolerance" and "tolerance_unit" options, None when masses have to be the same
+    value = options.get("tolerance")
+    if value is None:
+        return None
+
+    unit = options.get("tolerance_unit", "Da")
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0 or unit not in MASS_TOLERANCE_UNITS:
+        raise ValueError("Tolerancija mase nije ispravna.")
+
+    return MassTolerance(value, unit)
+
+
+# Target spectrum sorted once, so fragments are matched by binary search instead of being compared to every mass
+class SpectrumIndex:
+
+    def __init__(self, target_spectrum, tolerance):
+        self.masses = np.sort(np.asarray(target_spectrum, dtype=np.float64))
+        self.tolerance = tolerance
+
+    def count_matches(self, fragments):
+        # One row of fragment masses per peptide. Every target mass is matched to at most one fragment, so with a
+        # zero tolerance the number of matches is the same as when masses are compared exactly. Fragments are
+        # matched in ascending order, each to the lightest free target mass within the tolerance. Windows of
+        # heavier fragments never start or end before windows of lighter ones, so this matches as many fragments
+        # as possible while every column is a single pass over all rows.
+        fragments = np.sort(fragments, axis=1)
+        windows = self.tolerance.window(fragments)
+        first = np.searchsorted(self.masses, fragments - windows, side="left")
+        last = np.searchsorted(self.masses, fragments + windows, side="right")
+
+        number_of_rows, number_of_columns = fragments.shape
+        matches = np.zeros(number_of_rows, dtype=np.int64)
+        next_free = np.zeros(number_of_rows, dtype=np.int64)
+
+        for column in range(number_of_columns):
+            candidate = np.maximum(next_free, first[:, column])
+            matched = candidate < last[:, column]
+            matches += matched
+            next_free = candidate + matched
+
+        return matches
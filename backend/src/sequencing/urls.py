@@ -1,10 +1,18 @@
 from django.urls import path
-from .views import BruteForce, BranchAndBound, Leaderboard, SpectralConvolution, TimedExecutions
+from .views import (BruteForce, BranchAndBound, SpectrumGraph, Leaderboard, SpectralConvolution, Spectrum, PeptideCount,
+                    TimedExecutions, Jobs, JobDetail, Batch, Metrics)
 
 urlpatterns = [
     path('brute_force/', BruteForce.as_view(), name='brute_force'),
     path('branch_and_bound/', BranchAndBound.as_view(), name='branch_and_bound'),
+    path('spectrum_graph/', SpectrumGraph.as_view(), name='spectrum_graph'),
     path('leaderboard/', Leaderboard.as_view(), name='leaderboard'),
     path('spectral_convolution/', SpectralConvolution.as_view(), name='spectral_convolution'),
     path('timed_executions/', TimedExecutions.as_view(), name='timed_executions'),
+    path('spectrum/', Spectrum.as_view(), name='spectrum'),
+    path('peptide_count/', PeptideCount.as_view(), name='peptide_count'),
+    path('jobs/', Jobs.as_view(), name='jobs'),
+    path('jobs/<uuid:job_id>/', JobDetail.as_view(), name='job_detail'),
+    path('batch/', Batch.as_view(), name='batch'),
+    path('metrics/', Metrics.as_view(), name='metrics'),
 ]
@@ -1,192 +1,125 @@
-from .consts import AMINO_ACID_MASSES, AMINO_ACID_BASED_ON_MASSES, MAX_NUMBER_OF_CANDIDATES
-from .common_functions import calculate_peptide_mass, score, extend
-
-def linear_spectrum(peptide):
+import heapq
+from functools import lru_cache
+
+from .consts import AMINO_ACID_MASSES, MAX_NUMBER_OF_CANDIDATES, SPECTRUM_CACHE_SIZE
+from .alphabet import DEFAULT_ALPHABET
+from .budget import Budget
+from .candidate import Candidate
+from .common_functions import extend
+from .scoring import ScoreMemo, batch_linear_score, batch_cyclic_score
+from .stats import NO_STATS
+from .tolerance import same_mass
+
+def spectrum_with_subpeptides(peptide, cyclic=False):
     n = len(peptide)
+    prefix_mass = peptide.prefix_masses
+    peptide_mass = peptide.mass
+    sequence = peptide.peptide
 
-    prefix_mass = [0 for _ in range(n + 1)]
-
-    for i in range(n):
-        amino_acid = peptide[i]
-        prefix_mass[i + 1] = prefix_mass[i] + AMINO_ACID_MASSES[amino_acid]
-
-    spectrum = [0]
-    spectrum_with_subpeptides = [
-        {
-            "mass": 0,
-            "subpeptide": ""
-        }
-    ]
-
-    for i in range(n):
-        for j in range(i + 1, n + 1):
-            fragment_mass = prefix_mass[j] - prefix_mass[i]
-            spectrum.append(fragment_mass)
-            spectrum_with_subpeptides.append({
-                "mass": fragment_mass,
-                "subpeptide": peptide[i:j]
-            })
-
-    spectrum.sort()
-    spectrum_with_subpeptides_sorted = sorted(spectrum_with_subpeptides, key=lambda x: x["mass"])
-    return spectrum, spectrum_with_subpeptides_sorted
-
-
-def cyclic_spectrum(peptide):
-    n = len(peptide)
-
-    prefix_mass = [0 for _ in range(n + 1)]
-
-    for i in range(n):
-        amino_acid = peptide[i]
-        prefix_mass[i + 1] = prefix_mass[i] + AMINO_ACID_MASSES[amino_acid]
-
-    spectrum = [0]
     spectrum_with_subpeptides = [
         {
             "mass": 0,
             "subpeptide": ""
         }
     ]
-    peptide_mass = prefix_mass[-1]
 
     for i in range(n):
         for j in range(i + 1, n + 1):
             fragment_mass = prefix_mass[j] - prefix_mass[i]
-            spectrum.append(fragment_mass)
             spectrum_with_subpeptides.append({
                 "mass": fragment_mass,
-                "subpeptide": peptide[i:j]
+                "subpeptide": sequence[i:j]
             })
 
-            if i > 0 and j < n:
-                spectrum.append(peptide_mass - fragment_mass)
+            if cyclic and i > 0 and j < n:
                 spectrum_with_subpeptides.append({
                     "mass": peptide_mass - fragment_mass,
-                    "subpeptide": peptide[j:n] + peptide[0:i]
+                    "subpeptide": sequence[j:n] + sequence[0:i]
                 })
 
-    spectrum.sort()
-    spectrum_with_subpeptides_sorted = sorted(spectrum_with_subpeptides, key=lambda x: x["mass"])
-    return spectrum, spectrum_with_subpeptides_sorted
+    return sorted(spectrum_with_subpeptides, key=lambda x: x["mass"])
 
 
-def extend_for_tree(peptides, tree, amino_acid_candidates=AMINO_ACID_MASSES.keys()):
-    extended_peptides = []
-
-    for peptide in peptides:
-        for amino_acid in amino_acid_candidates:
-            if amino_acid != "":
-                new_candidate = peptide + amino_acid
-                extended_peptides.append(new_candidate)
-                tree[new_candidate] = {
-                    "node": new_candidate,
-                    "children": [],
-                    "end": False
-                }
-                if peptide == "":
-                    tree["Root"]["children"].append(new_candidate)
-                else:
-                    tree[peptide]["children"].append(new_candidate)
-
-    return extended_peptides
-
-
-def is_consistent_with_spectrum(peptide, target_spectrum):
-    peptide_spectrum, _ = linear_spectrum(peptide)
-
-    i = 0
-    j = 0
-    n = len(peptide_spectrum)
-    m = len(target_spectrum)
-
-    while i < n and j < m:
-        if peptide_spectrum[i] == target_spectrum[j]:
-            i += 1
-            j += 1
-        elif peptide_spectrum[i] > target_spectrum[j]:
-            j += 1
-        else:
-            return False
-
-    if i < n:
-        return False
-    else:
-        return True
-
-
-def linear_score(peptide, target_spectrum):
-    peptide_linear_spectrum, spectrum_with_subpeptides_sorted = linear_spectrum(peptide)
-    return score(peptide_linear_spectrum, target_spectrum), spectrum_with_subpeptides_sorted
-
-
-def cyclic_score(peptide, target_spectrum):
-    peptide_cyclic_spectrum, spectrum_with_subpeptides = cyclic_spectrum(peptide)
-    return score(peptide_cyclic_spectrum, target_spectrum), spectrum_with_subpeptides
-
-
-def trim(peptides, target_spectrum, max_number_of_candidates):
+def trim(peptides, target_spectrum, max_number_of_candidates, with_spectrum=True, tolerance=None, stats=NO_STATS,
+         memo=None):
     leaderboard = []
+    with stats.timer("scoring"):
+        peptide_scores = batch_linear_score(peptides, target_spectrum, tolerance, memo)
+    stats.count("spectra_computed", len(peptides))
 
-    for peptide in peptides:
-        peptide_mass = calculate_peptide_mass(peptide)
-        peptide_score, spectrum_with_subpeptides_sorted = linear_score(peptide, target_spectrum)
+    for peptide, peptide_score in zip(peptides, peptide_scores):
         current_candidate = {
-            "peptide": peptide,
-            "mass": peptide_mass,
+            "peptide": peptide.peptide,
+            "mass": peptide.mass,
             "number_of_matches": peptide_score,
-            "spectrum": spectrum_with_subpeptides_sorted,
             "qualified": False
         }
+        if with_spectrum:
+            current_candidate["spectrum"] = spectrum_with_subpeptides(peptide)
         leaderboard.append(current_candidate)
 
-    leaderboard = sorted(leaderboard, reverse=True, key=lambda x: x["number_of_matches"])
-
     if len(peptides) <= max_number_of_candidates:
-        leaderboard = [{**item, "qualified": True} for item in leaderboard]
+        for item in leaderboard:
+            item["qualified"] = True
         return peptides, leaderboard
 
-    for i in range(0, max_number_of_candidates):
-        leaderboard[i]["qualified"] = True
+    # Only the best max_number_of_candidates peptides are selected, in the same order as a stable sort would give,
+    # the rest of the leaderboard is ordered by the caller
+    with stats.timer("trimming"):
+        best_peptides = heapq.nlargest(max_number_of_candidates, range(len(peptides)),
+                                       key=peptide_scores.__getitem__)
+        for i in best_peptides:
+            leaderboard[i]["qualified"] = True
 
-    for i in range(max_number_of_candidates, len(leaderboard)):
-        if leaderboard[i]["number_of_matches"] < leaderboard[max_number_of_candidates - 1]["number_of_matches"]:
-            break
+        # Peptides tied with the last qualified one stay in the game as well
+        lowest_score = peptide_scores[best_peptides[-1]]
+        trimmed_peptides = [i for i in range(len(peptides)) if peptide_scores[i] >= lowest_score]
+        trimmed_peptides.sort(reverse=True, key=peptide_scores.__getitem__)
 
-    trimmed_leaderboard = leaderboard[:i]
-    return [el["peptide"] for el in trimmed_leaderboard], leaderboard
+    return [peptides[i] for i in trimmed_peptides], leaderboard
 
 
-def leaderboard_sequencing(target_spectrum, amino_acid_candidates=AMINO_ACID_MASSES.keys()):
-    peptides = ['']
+def leaderboard_rounds(target_spectrum, alphabet=DEFAULT_ALPHABET, with_spectrum=True, budget=None, tolerance=None):
+    # Yields the leaderboard of every round as soon as it is done, together with the leader peptides so far.
+    # Without with_spectrum candidates don't carry their spectrum, it can be fetched for a single peptide later.
+    # With a tolerance peptides are matched to the spectrum within the tolerance instead of exactly.
+    if budget is None:
+        budget = Budget()
+
+    stats = budget.stats
+    memo = ScoreMemo()
+    peptides = [Candidate()]
 
-    leaderboard = []
-    current_round = 0
     leader_peptide = []
     leader_peptide_score = 0
 
     target_peptide_mass = target_spectrum[-1]
 
-    while len(peptides) > 0:
-        leaderboard.append([])
-        extended_peptides = extend(peptides, amino_acid_candidates)
+    while len(peptides) > 0 and budget.spend(len(peptides) * len(alphabet)):
+        extended_peptides = extend(peptides, alphabet)
+        stats.count("rounds")
+        stats.count("nodes_generated", len(extended_peptides))
+        stats.count("spectra_computed", len(extended_peptides))
 
         consistent_peptides = []
         potential_candidates = []
-        for peptide in extended_peptides:
-            peptide_mass = calculate_peptide_mass(peptide)
-            peptide_score, spectrum_with_subpeptides_sorted = cyclic_score(peptide, target_spectrum)
+        number_of_too_heavy = 0
+        with stats.timer("scoring"):
+            peptide_scores = batch_cyclic_score(extended_peptides, target_spectrum, tolerance, memo)
+        for peptide, peptide_score in zip(extended_peptides, peptide_scores):
+            peptide_mass = peptide.mass
 
             current_candidate = {
-                "peptide": peptide,
+                "peptide": peptide.peptide,
                 "mass": peptide_mass,
                 "number_of_matches": peptide_score,
-                "spectrum": spectrum_with_subpeptides_sorted,
                 "candidate": False,
                 "qualified": False
             }
+            if with_spectrum:
+                current_candidate["spectrum"] = spectrum_with_subpeptides(peptide, cyclic=True)
 
-            if peptide_mass == target_peptide_mass:
+            if same_mass(peptide_mass, target_peptide_mass, tolerance):
                 current_candidate["candidate"]: True
                 current_candidate["reason"] = "Masa je jednaka traženoj masi, ovaj peptid je kandidat za rešenje."
                 potential_candidates.append(current_candidate)
@@ -201,15 +134,40 @@ def leaderboard_sequencing(target_spectrum, amino_acid_candidates=AMINO_ACID_MAS
             else:
                 current_candidate["reason"] = "Nije rešenje jer je masa veća od tražene mase"
                 potential_candidates.append(current_candidate)
+                number_of_too_heavy += 1
 
-        peptides, current_round_peptides = trim(consistent_peptides, target_spectrum, MAX_NUMBER_OF_CANDIDATES)
+        stats.count("pruned_by_mass", number_of_too_heavy)
+        peptides, current_round_peptides = trim(consistent_peptides, target_spectrum, MAX_NUMBER_OF_CANDIDATES,
+                                                with_spectrum, tolerance, stats, memo)
         current_round_peptides = current_round_peptides + potential_candidates
-        leaderboard[current_round] = sorted(current_round_peptides, reverse=True, key=lambda x: x["number_of_matches"])
-        current_round += 1
+        yield sorted(current_round_peptides, reverse=True, key=lambda x: x["number_of_matches"]), leader_peptide
+
+
+def leaderboard_sequencing(target_spectrum, alphabet=DEFAULT_ALPHABET, with_spectrum=True, budget=None,
+                           tolerance=None):
+    if budget is None:
+        budget = Budget()
+
+    leaderboard = []
+    leader_peptide = []
+    rounds = leaderboard_rounds(target_spectrum, alphabet, with_spectrum, budget, tolerance)
+
+    for current_round_peptides, leader_peptide in rounds:
+        leaderboard.append(current_round_peptides)
 
     response = {
         "leaderboard": leaderboard,
         "solution": leader_peptide,
-        "N": MAX_NUMBER_OF_CANDIDATES
+        "N": MAX_NUMBER_OF_CANDIDATES,
+        "truncated": budget.truncated
     }
     return response
+
+
+@lru_cache(maxsize=SPECTRUM_CACHE_SIZE)
+def peptide_spectrum(peptide, cyclic):
+    candidate = Candidate()
+    for amino_acid in peptide:
+        candidate = candidate.extend(amino_acid, AMINO_ACID_MASSES[amino_acid])
+
+    return spectrum_with_subpeptides(candidate, cyclic)
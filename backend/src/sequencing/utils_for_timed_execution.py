@@ -1,218 +1,371 @@
-from .common_functions import calculate_peptide_mass, score, extend, prepare_amino_acids_that_are_candidates
-from .consts import AMINO_ACID_MASSES, MAX_NUMBER_OF_CANDIDATES
+import heapq
+import timeit
+from concurrent.futures import FIRST_COMPLETED, wait
+from multiprocessing import TimeoutError, get_context
+
+from .alphabet import Alphabet, DEFAULT_ALPHABET
+from .budget import Budget
+from .candidate import Candidate
+from .common_functions import (count_masses, count_peptides_by_mass, extend, extend_by_mass,
+                               is_consistent_with_spectrum, number_of_peptides, peptides_from_masses,
+                               prepare_amino_acids_that_are_candidates)
+from .consts import (MAX_NUMBER_OF_CANDIDATES, PEPTIDE_EXTENDABLE, PEPTIDE_SOLUTION, PEPTIDE_NOT_SOLUTION,
+                     PEPTIDE_INCONSISTENT, PEPTIDE_TOO_HEAVY, PREFIXES_PER_WORKER, TIMEOUT_GRACE_IN_SECONDS)
+from .convolution import spectral_convolution
+from .offload import worker_pool
+from .scoring import batch_linear_score, batch_cyclic_score
+from .spectrum_graph import spectrum_graph
+from .stats import NO_STATS
+from .tolerance import same_mass
+
+
+def trim(peptides, target_spectrum, max_number_of_candidates, alphabet, tolerance=None, stats=NO_STATS):
+    with stats.timer("scoring"):
+        leaderboard = list(zip(batch_linear_score(peptides, target_spectrum, tolerance), peptides))
+    stats.count("spectra_computed", len(peptides))
+
+    # Every candidate stands for all peptides that have its sequence of masses and takes that many places.
+    # Since it takes at least one, the lowest score that is kept is found among the best max_number_of_candidates
+    # candidates and the rest of the leaderboard never has to be sorted.
+    with stats.timer("trimming"):
+        best_candidates = heapq.nlargest(max_number_of_candidates, leaderboard, key=lambda x: x[0])
+
+        number_of_places_taken = 0
+        for peptide_score, peptide in best_candidates:
+            number_of_places_taken += number_of_peptides(peptide, alphabet)
+            if number_of_places_taken >= max_number_of_candidates:
+                return [el[1] for el in leaderboard if el[0] >= peptide_score]
+
+    return peptides
+
+
+def leaderboard_sequencing_without_additional_data(target_spectrum, alphabet=DEFAULT_ALPHABET, budget=None,
+                                                   tolerance=None, peptide_counts=None):
+    if budget is None:
+        budget = Budget()
+
+    stats = budget.stats
+    peptides = [Candidate()]
 
+    leader_peptide = []
+    leader_peptide_score = 0
 
-def linear_spectrum(peptide):
-    n = len(peptide)
-
-    prefix_mass = [0 for _ in range(n + 1)]
+    target_peptide_mass = target_spectrum[-1]
+    if tolerance is None:
+        max_peptide_mass = target_peptide_mass
+        if peptide_counts is None:
+            peptide_counts = count_peptides_by_mass(target_peptide_mass, alphabet)
+    else:
+        # Peptides within the tolerance above the target mass still match it, and real masses can't be looked up
+        # in the table of peptide counts
+        max_peptide_mass = target_peptide_mass + tolerance.window(target_peptide_mass)
+        peptide_counts = None
 
-    for i in range(n):
-        amino_acid = peptide[i]
-        prefix_mass[i + 1] = prefix_mass[i] + AMINO_ACID_MASSES[amino_acid]
+    while len(peptides) > 0 and budget.spend(len(peptides) * len(alphabet.masses)):
+        extended_peptides = extend_by_mass(peptides, alphabet.masses, max_peptide_mass, peptide_counts)
 
-    spectrum = [0]
+        consistent_peptides = []
+        potential_candidates = []
+        for peptide in extended_peptides:
+            peptide_mass = peptide.mass
 
-    for i in range(n):
-        for j in range(i + 1, n + 1):
-            fragment_mass = prefix_mass[j] - prefix_mass[i]
-            spectrum.append(fragment_mass)
+            if same_mass(peptide_mass, target_peptide_mass, tolerance):
+                potential_candidates.append(peptide)
+            elif peptide_mass < target_peptide_mass:
+                consistent_peptides.append(peptide)
 
-    spectrum.sort()
-    return spectrum
+        stats.count("rounds")
+        stats.count("nodes_generated", len(extended_peptides))
+        stats.count("pruned_by_mass", len(peptides) * len(alphabet.masses) - len(consistent_peptides)
+                    - len(potential_candidates))
+        stats.count("spectra_computed", len(potential_candidates))
 
+        with stats.timer("scoring"):
+            potential_candidates_scores = batch_cyclic_score(potential_candidates, target_spectrum, tolerance)
+        for peptide_score, peptide in zip(potential_candidates_scores, potential_candidates):
+            if peptide_score > leader_peptide_score:
+                leader_peptide = [peptide]
+                leader_peptide_score = peptide_score
+            elif peptide_score == leader_peptide_score:
+                leader_peptide.append(peptide)
 
-def cyclic_spectrum(peptide):
-    n = len(peptide)
+        peptides = trim(consistent_peptides, target_spectrum, MAX_NUMBER_OF_CANDIDATES, alphabet, tolerance, stats)
 
-    prefix_mass = [0 for _ in range(n + 1)]
+    return {
+        "solution": [
+            {
+                "peptide": peptide,
+                "mass": target_peptide_mass,
+                "number_of_matches": leader_peptide_score
+            }
+            for peptide in peptides_from_masses([peptide.amino_acid_masses for peptide in leader_peptide], alphabet)
+        ],
+        "truncated": budget.truncated
+    }
 
-    for i in range(n):
-        amino_acid = peptide[i]
-        prefix_mass[i + 1] = prefix_mass[i] + AMINO_ACID_MASSES[amino_acid]
 
-    spectrum = [0]
-    peptide_mass = prefix_mass[-1]
+def convolution_sequencing(target_spectrum, number_of_largest_elements, budget=None):
+    _, top_masses = spectral_convolution(target_spectrum, number_of_largest_elements)
+    alphabet = Alphabet(prepare_amino_acids_that_are_candidates(top_masses))
+    return leaderboard_sequencing_without_additional_data(target_spectrum, alphabet, budget)
 
-    for i in range(n):
-        for j in range(i + 1, n + 1):
-            fragment_mass = prefix_mass[j] - prefix_mass[i]
-            spectrum.append(fragment_mass)
 
-            if i > 0 and j < n:
-                spectrum.append(peptide_mass - fragment_mass)
+def peptide_status(peptide, target_spectrum, target_spectrum_counts, check_consistency):
+    target_peptide_mass = target_spectrum[-1]
 
-    spectrum.sort()
-    return spectrum
+    if peptide.mass == target_peptide_mass:
+        return PEPTIDE_SOLUTION if peptide.cyclic_spectrum == target_spectrum else PEPTIDE_NOT_SOLUTION
+    elif peptide.mass < target_peptide_mass:
+        if check_consistency and not is_consistent_with_spectrum(peptide, target_spectrum_counts):
+            return PEPTIDE_INCONSISTENT
+        return PEPTIDE_EXTENDABLE
 
+    return PEPTIDE_TOO_HEAVY
 
-def linear_score(peptide, target_spectrum):
-    peptide_linear_spectrum = linear_spectrum(peptide)
-    return score(peptide_linear_spectrum, target_spectrum)
 
+def pruned_counts():
+    # Number of peptides dropped for every status that isn't extended further
+    return {PEPTIDE_NOT_SOLUTION: 0, PEPTIDE_INCONSISTENT: 0, PEPTIDE_TOO_HEAVY: 0}
 
-def cyclic_score(peptide, target_spectrum):
-    peptide_cyclic_spectrum = cyclic_spectrum(peptide)
-    return score(peptide_cyclic_spectrum, target_spectrum)
 
+def classify_children(children, target_spectrum, target_spectrum_counts, check_consistency, solution, extendable,
+                      pruned, observer=None):
+    # Sorts new peptides into the solutions and the peptides that are extended further, and counts the rest in
+    # pruned by their status. Every search of the tree goes through here, so they all judge peptides the same way.
+    for child in children:
+        status = peptide_status(child, target_spectrum, target_spectrum_counts, check_consistency)
 
-def trim(peptides, target_spectrum, max_number_of_candidates):
-    if len(peptides) <= max_number_of_candidates:
-        return peptides
+        if status == PEPTIDE_SOLUTION:
+            solution.append(child)
+        elif status == PEPTIDE_EXTENDABLE:
+            extendable.append(child)
+        else:
+            pruned[status] += 1
 
-    leaderboard = []
+        if observer is not None:
+            observer.visited(child, status)
 
-    for peptide in peptides:
-        peptide_score = linear_score(peptide, target_spectrum)
-        leaderboard.append((peptide_score, peptide))
 
-    leaderboard.sort(reverse=True)
+def count_statuses(stats, number_of_peptides_generated, number_of_solutions, pruned, number_of_peptides_skipped=0):
+    # Peptides heavier than the target are pruned by mass together with the ones that were never created, and the
+    # cyclic spectrum is computed for every peptide with the target mass
+    stats.count("nodes_generated", number_of_peptides_generated)
+    stats.count("pruned_by_mass", pruned[PEPTIDE_TOO_HEAVY] + number_of_peptides_skipped)
+    stats.count("pruned_by_consistency", pruned[PEPTIDE_INCONSISTENT])
+    stats.count("spectra_computed", number_of_solutions + pruned[PEPTIDE_NOT_SOLUTION])
 
-    for i in range(max_number_of_candidates, len(leaderboard)):
-        if leaderboard[i][0] < leaderboard[max_number_of_candidates - 1][0]:
-            break
 
-    trimmed_leaderboard = leaderboard[:i]
-    return [el[1] for el in trimmed_leaderboard]
+def extension_sequencing(target_spectrum, check_consistency, observer, budget):
+    # Level by level search used for the tree visualization, yields the solutions found on every level of the tree.
+    # The observer needs every peptide spelled out, so peptides are extended letter by letter and each one is
+    # reported to it. A level is only extended if the whole level fits in the budget.
+    target_spectrum_counts = count_masses(target_spectrum)
+    peptides = [Candidate()]
 
+    while len(peptides) > 0 and budget.spend(len(peptides) * len(DEFAULT_ALPHABET)):
+        solution = []
+        extended_peptides = extend(peptides, DEFAULT_ALPHABET)
+        observer.extended(extended_peptides)
 
-def is_consistent_with_spectrum(peptide, target_spectrum):
-    peptide_spectrum = linear_spectrum(peptide)
+        candidates = []
+        pruned = pruned_counts()
+        classify_children(extended_peptides, target_spectrum, target_spectrum_counts, check_consistency, solution,
+                          candidates, pruned, observer)
 
-    i = 0
-    j = 0
-    n = len(peptide_spectrum)
-    m = len(target_spectrum)
+        budget.stats.count("levels")
+        count_statuses(budget.stats, len(extended_peptides), len(solution), pruned)
+        peptides = candidates
+        yield [peptide.peptide for peptide in solution]
 
-    while i < n and j < m:
-        if peptide_spectrum[i] == target_spectrum[j]:
-            i += 1
-            j += 1
-        elif peptide_spectrum[i] > target_spectrum[j]:
-            j += 1
-        else:
-            return False
 
-    if i < n:
-        return False
-    else:
-        return True
+def depth_first_sequencing(target_spectrum, check_consistency, budget, prefix=(), peptide_counts=None):
+    # Searches the subtree of the peptide with the given sequence of amino acid masses (the whole tree by default)
+    # and returns the sequences of amino acid masses of the solutions. Peptides are extended by mass and peptides
+    # heavier than the target are never created. The stack only holds the children of the peptides on the current
+    # path, so memory grows with the length of the peptide instead of with the width of the tree.
+    target_peptide_mass = target_spectrum[-1]
+    target_spectrum_counts = count_masses(target_spectrum)
+    amino_acid_masses = sorted(DEFAULT_ALPHABET.masses, reverse=True)
+    if peptide_counts is None:
+        peptide_counts = count_peptides_by_mass(target_peptide_mass, DEFAULT_ALPHABET)
 
+    root = Candidate()
+    for amino_acid_mass in prefix:
+        root = root.extend_by_mass(amino_acid_mass)
 
-def leaderboard_sequencing_without_additional_data(target_spectrum, amino_acid_candidates=AMINO_ACID_MASSES.keys()):
-    peptides = ['']
+    solution = []
+    stack = [root]
+    # Counted here and added to the stats once, the loop runs for every node of the tree
+    number_of_peptides_extended = 0
+    number_of_peptides_generated = 0
+    pruned = pruned_counts()
 
-    leader_peptide = []
-    leader_peptide_score = 0
+    while len(stack) > 0 and budget.spend(len(amino_acid_masses)):
+        peptide = stack.pop()
+        children = extend_by_mass([peptide], amino_acid_masses, target_peptide_mass, peptide_counts)
+        number_of_peptides_extended += 1
+        number_of_peptides_generated += len(children)
+        classify_children(children, target_spectrum, target_spectrum_counts, check_consistency, solution, stack,
+                          pruned)
 
-    target_peptide_mass = target_spectrum[-1]
+    count_statuses(budget.stats, number_of_peptides_generated, len(solution), pruned,
+                   number_of_peptides_extended * len(amino_acid_masses) - number_of_peptides_generated)
+    return [peptide.amino_acid_masses for peptide in solution]
 
-    while len(peptides) > 0:
-        extended_peptides = extend(peptides, amino_acid_candidates)
 
-        consistent_peptides = []
-        for peptide in extended_peptides:
-            peptide_mass = calculate_peptide_mass(peptide)
+def search_subtree(target_spectrum, check_consistency, budget, prefix):
+    # The worker gets a copy of the budget, so it is sent back with the solution to tell how far the search got
+    return depth_first_sequencing(target_spectrum, check_consistency, budget, prefix), budget
 
-            if peptide_mass == target_peptide_mass:
-                peptide_score = cyclic_score(peptide, target_spectrum)
 
-                current_candidate = {
-                    "peptide": peptide,
-                    "mass": peptide_mass,
-                    "number_of_matches": peptide_score
-                }
+def parallel_extension_sequencing(target_spectrum, check_consistency, max_workers, budget):
+    # Subtrees of different prefixes don't depend on each other. The first levels are extended here until there
+    # are enough prefixes to keep every worker busy, then each prefix is searched depth first in a worker.
+    target_peptide_mass = target_spectrum[-1]
+    target_spectrum_counts = count_masses(target_spectrum)
+    peptide_counts = count_peptides_by_mass(target_peptide_mass, DEFAULT_ALPHABET)
 
-                if peptide_score > leader_peptide_score:
-                    leader_peptide = [current_candidate]
-                    leader_peptide_score = peptide_score
-                elif peptide_score == leader_peptide_score:
-                    leader_peptide.append(current_candidate)
+    number_of_prefixes = max_workers * PREFIXES_PER_WORKER
 
-            elif peptide_mass < target_peptide_mass:
-                consistent_peptides.append(peptide)
-
-        peptides = trim(consistent_peptides, target_spectrum, MAX_NUMBER_OF_CANDIDATES)
+    solution = []
+    peptides = [Candidate()]
+
+    while 0 < len(peptides) < number_of_prefixes and budget.spend(len(peptides) * len(DEFAULT_ALPHABET.masses)):
+        extended_peptides = extend_by_mass(peptides, DEFAULT_ALPHABET.masses, target_peptide_mass, peptide_counts)
+        number_of_peptides_skipped = len(peptides) * len(DEFAULT_ALPHABET.masses) - len(extended_peptides)
+        number_of_solutions = len(solution)
+        peptides = []
+        pruned = pruned_counts()
+        classify_children(extended_peptides, target_spectrum, target_spectrum_counts, check_consistency, solution,
+                          peptides, pruned)
+
+        budget.stats.count("levels")
+        count_statuses(budget.stats, len(extended_peptides), len(solution) - number_of_solutions, pruned,
+                       number_of_peptides_skipped)
+
+    solution = [peptide.amino_acid_masses for peptide in solution]
+    prefixes = [] if budget.truncated else [peptide.amino_acid_masses for peptide in peptides]
+
+    if len(prefixes) > 0:
+        part = budget.split(len(prefixes))
+
+        # Workers are started fresh and leave once this process is gone, so they can't be left searching on their own
+        with worker_pool(max_workers) as executor:
+            pending = {executor.submit(search_subtree, target_spectrum, check_consistency, part, prefix)
+                       for prefix in prefixes}
+
+            while len(pending) > 0:
+                done, pending = wait(pending, timeout=budget.CHECK_INTERVAL_IN_SECONDS, return_when=FIRST_COMPLETED)
+                for result in done:
+                    subtree_solution, subtree_budget = result.result()
+                    solution.extend(subtree_solution)
+                    budget.merge(subtree_budget)
+
+                if len(pending) > 0 and not budget.check():
+                    # Subtrees that haven't started are dropped, the running ones notice that they should stop on
+                    # their own and are waited for
+                    executor.shutdown(cancel_futures=True)
+                    budget.truncated = True
+                    break
+
+    # Solutions are spelled out and ordered at the end, so the order doesn't depend on how the work was split
+    return peptides_from_masses(solution, DEFAULT_ALPHABET)
+
+
+def exhaustive_sequencing(target_spectrum, check_consistency, observer=None, max_workers=1, budget=None,
+                          peptide_counts=None):
+    if budget is None:
+        budget = Budget()
+
+    if observer is not None:
+        levels = extension_sequencing(target_spectrum, check_consistency, observer, budget)
+        solution = [peptide for level in levels for peptide in level]
+    elif max_workers > 1:
+        solution = parallel_extension_sequencing(target_spectrum, check_consistency, max_workers, budget)
+    else:
+        solution = depth_first_sequencing(target_spectrum, check_consistency, budget, peptide_counts=peptide_counts)
+        solution = peptides_from_masses(solution, DEFAULT_ALPHABET)
 
     return {
-        "solution": leader_peptide
+        "solution": solution,
+        "truncated": budget.truncated
     }
 
 
-def convolution_sequencing(target_spectrum, number_of_largest_elements):
-    convolution = []
-    for i in range(len(target_spectrum)):
-        for j in range(i):
-            diff = target_spectrum[i] - target_spectrum[j]
-            if 57 <= diff <= 200:
-                convolution.append(diff)
+def brute_force_sequencing(target_spectrum, observer=None, max_workers=1, budget=None, peptide_counts=None):
+    return exhaustive_sequencing(target_spectrum, False, observer, max_workers, budget, peptide_counts)
 
-    freq_dict = {}
-    for mass in convolution:
-        if mass in freq_dict:
-            freq_dict[mass] += 1
-        else:
-            freq_dict[mass] = 1
 
-    sorted_masses = sorted(freq_dict.items(), key=lambda x: x[1], reverse=True)
-    if number_of_largest_elements > len(sorted_masses):
-        top_masses = [mass for mass, _ in sorted_masses]
-    else:
-        number_of_showing = sorted_masses[number_of_largest_elements - 1][1]
-        top_masses = [mass for mass, num in sorted_masses if number_of_showing <= num]
+def branch_and_bound_sequencing(target_spectrum, observer=None, max_workers=1, budget=None, peptide_counts=None):
+    return exhaustive_sequencing(target_spectrum, True, observer, max_workers, budget, peptide_counts)
 
-    amino_acid_candidates = prepare_amino_acids_that_are_candidates(top_masses)
-    return leaderboard_sequencing_without_additional_data(target_spectrum, amino_acid_candidates)
 
+def spectrum_graph_sequencing(target_spectrum, budget=None, graph=None):
+    # Peptides are only extended along the edges of the spectrum graph, so every prefix mass is in the spectrum and
+    # can still be extended to the target mass. Prefixes that aren't consistent with the spectrum are dropped like
+    # in branch and bound, and the cyclic spectrum of every path that reaches the target mass is compared with it.
+    if budget is None:
+        budget = Budget()
 
-def brute_force_sequencing(target_spectrum):
-    peptides = ['']
-    target_peptide_mass = target_spectrum[-1]
-    solution = []
-
-    while len(peptides) > 0:
-        extended_peptides = extend(peptides)
+    target_spectrum_counts = count_masses(target_spectrum)
+    if graph is None:
+        graph = spectrum_graph(target_spectrum, DEFAULT_ALPHABET)
 
-        candidates = []
+    solution = []
+    stack = [Candidate()] if 0 in graph else []
+    number_of_peptides_generated = 0
+    pruned = pruned_counts()
 
-        for peptide in extended_peptides:
-            peptide_mass = calculate_peptide_mass(peptide)
-            if peptide_mass == target_peptide_mass:
-                calculated_spectrum = cyclic_spectrum(peptide)
-                if calculated_spectrum == target_spectrum:
-                    solution.append(peptide)
-            elif peptide_mass < target_peptide_mass:
-                candidates.append(peptide)
+    while len(stack) > 0 and budget.spend(len(graph[stack[-1].mass])):
+        peptide = stack.pop()
+        next_masses = graph[peptide.mass]
+        number_of_peptides_generated += len(next_masses)
+        children = [peptide.extend_by_mass(next_mass - peptide.mass) for next_mass in next_masses]
+        classify_children(children, target_spectrum, target_spectrum_counts, True, solution, stack, pruned)
 
-        peptides = candidates
+    count_statuses(budget.stats, number_of_peptides_generated, len(solution), pruned)
 
     return {
-        "solution": solution
+        "solution": peptides_from_masses([peptide.amino_acid_masses for peptide in solution], DEFAULT_ALPHABET),
+        "truncated": budget.truncated
     }
 
 
-def branch_and_bound_sequencing(target_spectrum):
-    peptides = ['']
-    target_peptide_mass = target_spectrum[-1]
-    solution = []
-
-    while len(peptides) > 0:
-        extended_peptides = extend(peptides)
-
-        consistent_peptides = []
-
-        for peptide in extended_peptides:
-            peptide_mass = calculate_peptide_mass(peptide)
-
-            if peptide_mass == target_peptide_mass:
-                calculated_spectrum = cyclic_spectrum(peptide)
-                if calculated_spectrum == target_spectrum:
-                    solution.append(peptide)
-            elif peptide_mass < target_peptide_mass:
-                if is_consistent_with_spectrum(peptide, target_spectrum):
-                    consistent_peptides.append(peptide)
-        peptides = consistent_peptides
+def timed_execution(solver, *args, **kwargs):
+    start = timeit.default_timer()
+    result = solver(*args, **kwargs)
+    result["execution_time"] = f"{timeit.default_timer() - start:.4f}"
+    return result
+
+
+def parallel_timed_executions(executions, timeouts):
+    # Every solver runs in its own process and measures its own time, so the times don't include waiting for the
+    # other solvers. Solvers stop on their own when their time runs out and return what they found so far. Solvers
+    # that still don't finish shortly after that are reported as timed out and killed with the pool.
+    # Workers are forked from a separate server process, forking the threaded server that handles requests could
+    # leave them waiting on locks held by other threads.
+    start = timeit.default_timer()
+    results = {}
+
+    context = get_context("forkserver")
+    # The server imports the solvers once, so the workers forked from it don't have to
+    context.set_forkserver_preload([__name__])
+
+    with context.Pool(len(executions)) as pool:
+        pending = {
+            name: pool.apply_async(timed_execution, execution, {"budget": Budget(max_seconds=timeouts[name])})
+            for name, execution in executions.items()
+        }
+
+        for name, result in pending.items():
+            remaining_time = timeouts[name] + TIMEOUT_GRACE_IN_SECONDS - (timeit.default_timer() - start)
+            try:
+                results[name] = result.get(timeout=max(remaining_time, 0))
+            except TimeoutError:
+                results[name] = {
+                    "solution": [],
+                    "execution_time": "timed out",
+                    "timed_out": True
+                }
 
-    return {
-        "solution": solution
-    }
+    return results
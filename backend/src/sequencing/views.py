@@ -1,134 +1,285 @@
+from itertools import chain
 from json import loads
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.utils.decorators import method_decorator
 from django.views.generic.base import View
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from .utils import (calculate_peptide_mass, cyclic_spectrum, is_consistent_with_spectrum, extend_for_tree,
-                    leaderboard_sequencing)
-from .utils_for_timed_execution import (brute_force_sequencing, branch_and_bound_sequencing,
-                                        leaderboard_sequencing_without_additional_data, convolution_sequencing)
-from .common_functions import prepare_amino_acids_that_are_candidates
-import timeit
+from .alphabet import Alphabet, DEFAULT_ALPHABET, alphabet_for
+from .batch import batch_lines
+from .budget import Budget, estimate_number_of_nodes
+from .cache import cached_result
+from .consts import (AMINO_ACID_MASSES, BATCH_MAX_SPECTRA, JOB_ALGORITHMS, MAX_NUMBER_OF_CANDIDATES,
+                     MAX_PEPTIDE_MASS, MAX_SPECTRUM_LENGTH, MAX_SPECTRUM_PEPTIDE_LENGTH, SEARCH_BUDGETS)
+from .convolution import spectral_convolution
+from .jobs import cancel_job, job_response, submit_job
+from .models import Job
+from .offload import ndjson_response, solve, timed_execution_slots
+from .observers import ColumnarTreeObserver, create_tree_observer
+from .spectrum_graph import spectrum_graph
+from .stats import METRICS, NO_STATS, SearchStats
+from .tolerance import parse_tolerance
+from .utils import leaderboard_rounds, leaderboard_sequencing, peptide_spectrum
+from .utils_for_timed_execution import (brute_force_sequencing, branch_and_bound_sequencing, extension_sequencing,
+                                        leaderboard_sequencing_without_additional_data, convolution_sequencing,
+                                        parallel_timed_executions, spectrum_graph_sequencing)
+from .common_functions import count_peptides, prepare_amino_acids_that_are_candidates
+
+
+def target_spectrum_error(target_spectrum, real_masses=False):
+    # Error of a spectrum that can't be searched, or None. The last mass of the spectrum is the mass of the peptide.
+    # Masses have to be integers unless they are matched within a tolerance, and no mass can be heavier than the
+    # heaviest peptide, which also keeps out NaN and infinite masses.
+    if not isinstance(target_spectrum, list) or len(target_spectrum) == 0:
+        return "Spektar nije ispravan."
+    if len(target_spectrum) > MAX_SPECTRUM_LENGTH:
+        return f"Spektar može imati najviše {MAX_SPECTRUM_LENGTH} masa."
+
+    mass_types = (int, float) if real_masses else int
+    peptide_mass = target_spectrum[-1]
+    if (isinstance(peptide_mass, bool) or not isinstance(peptide_mass, mass_types)
+            or not 0 <= peptide_mass <= MAX_PEPTIDE_MASS):
+        number = "broj" if real_masses else "ceo broj"
+        return f"Masa peptida mora biti {number} između 0 i {MAX_PEPTIDE_MASS}."
+
+    if any(isinstance(mass, bool) or not isinstance(mass, mass_types) or not 0 <= mass <= MAX_PEPTIDE_MASS
+           for mass in target_spectrum):
+        numbers = "brojevi" if real_masses else "celi brojevi"
+        return f"Mase u spektru moraju biti {numbers} između 0 i {MAX_PEPTIDE_MASS}."
+
+    return None
+
+
+async def admit(algorithm, target_spectrum, alphabet=DEFAULT_ALPHABET, real_masses=False, graph=None):
+    # Estimates the search before it is started. Searches that are too big to give a useful partial result are
+    # refused, the rest get the budget of the algorithm. Heavy spectra are refused before they are estimated, and
+    # the estimate runs in a thread since it can take a while for the rest. The estimate of a spectrum graph search
+    # counts the paths of the graph the search uses.
+    error = target_spectrum_error(target_spectrum, real_masses)
+    if error is not None:
+        return None, JsonResponse({"error": error}, status=400)
+
+    limits = SEARCH_BUDGETS[algorithm]
+    estimated_nodes = await sync_to_async(estimate_number_of_nodes, thread_sensitive=False)(
+        algorithm, target_spectrum, alphabet, limits["max_estimated_nodes"], graph)
+
+    if estimated_nodes > limits["max_estimated_nodes"]:
+        refusal = JsonResponse({
+            "error": "Pretraga za zadati spektar je prevelika.",
+            "max_estimated_nodes": limits["max_estimated_nodes"]
+        }, status=400)
+        return None, refusal
+
+    stats = SearchStats(algorithm) if settings.SEQUENCING_STATS else NO_STATS
+    return Budget(limits["max_nodes"], limits["max_seconds"], estimated_nodes, stats), None
+
+
+def last_event(event, budget, with_stats):
+    # Streamed searches are finished once their last line is produced, so that is when their stats are recorded
+    if with_stats:
+        event["stats"] = budget.stats.summary()
+
+    METRICS.record(budget.stats)
+    return event
+
+
+def search_parameters(algorithm, body):
+    # Parameters of a search that runs outside of the request, raises ValueError if the tolerance isn't valid
+    parameters = {}
+    if algorithm == "spectral_convolution":
+        parameters["number_of_largest_elements"] = SpectralConvolution.NUMBER_OF_LARGEST_ELEMENTS
+    if algorithm == "leaderboard" and body.get("tolerance") is not None:
+        tolerance = parse_tolerance(body)
+        parameters["tolerance"] = tolerance.value
+        parameters["tolerance_unit"] = tolerance.unit
+
+    return parameters
+
+
+def tree_events(target_spectrum, check_consistency, budget, with_stats=False):
+    # Streamed trees are always columnar, the first line has the root and the lookup tables and every next line
+    # has the nodes of one level of the tree. The last line tells whether the search was truncated.
+    tree_observer = ColumnarTreeObserver()
+    levels = extension_sequencing(target_spectrum, check_consistency, tree_observer, budget)
+
+    yield tree_observer.tree
+    tree_observer.flush()
+
+    for level, level_solution in enumerate(levels, 1):
+        yield {
+            "level": level,
+            "solution": level_solution,
+            **tree_observer.flush()
+        }
+
+    yield last_event({"truncated": budget.truncated}, budget, with_stats)
+
+
+def leaderboard_events(target_spectrum, alphabet, with_spectrum, budget, tolerance=None, with_stats=False):
+    leader_peptide = []
+    rounds = leaderboard_rounds(target_spectrum, alphabet, with_spectrum, budget, tolerance)
+
+    for current_round, (current_round_peptides, leader_peptide) in enumerate(rounds):
+        yield {
+            "round": current_round,
+            "leaderboard": current_round_peptides
+        }
+
+    yield last_event({
+        "solution": leader_peptide,
+        "N": MAX_NUMBER_OF_CANDIDATES,
+        "truncated": budget.truncated
+    }, budget, with_stats)
+
+
+def brute_force_response(target_spectrum, tree_format, budget):
+    tree_observer = create_tree_observer(tree_format)
+    brute_force = brute_force_sequencing(target_spectrum, tree_observer, budget=budget)
+
+    return {
+        "candidates": tree_observer.results,
+        "tree": tree_observer.tree,
+        "solution": brute_force["solution"],
+        "truncated": brute_force["truncated"]
+    }
+
+
+def branch_and_bound_response(target_spectrum, tree_format, budget):
+    tree_observer = create_tree_observer(tree_format, mark_candidates=True)
+    branch_and_bound = branch_and_bound_sequencing(target_spectrum, tree_observer, budget=budget)
+
+    return {
+        "candidates": tree_observer.results,
+        "tree": tree_observer.tree,
+        "solution": branch_and_bound["solution"],
+        "truncated": branch_and_bound["truncated"]
+    }
+
+
+def leaderboard_response(target_spectrum, with_spectrum, tolerance, budget):
+    return leaderboard_sequencing(target_spectrum, alphabet_for(tolerance), with_spectrum, budget, tolerance)
+
+
+def spectral_convolution_response(target_spectrum, convolution, alphabet, with_spectrum, budget):
+    leaderboard_response = leaderboard_sequencing(target_spectrum, alphabet, with_spectrum, budget)
+
+    return {
+        "amino_acids_in_peptides": convolution["amino_acids_in_peptides"],
+        "top": convolution["top"],
+        "amino_acid_candidates": convolution["amino_acid_candidates"],
+        "leaderboard": leaderboard_response["leaderboard"],
+        "solution": leaderboard_response["solution"],
+        "N": leaderboard_response["N"],
+        "M": convolution["M"],
+        "truncated": leaderboard_response["truncated"]
+    }
+
+
+def spectrum_graph_response(target_spectrum, graph, budget):
+    spectrum_graph_result = spectrum_graph_sequencing(target_spectrum, budget, graph)
+
+    return {
+        "nodes": list(graph),
+        "edges": [
+            {
+                "from": mass,
+                "to": next_mass,
+                "amino_acids": DEFAULT_ALPHABET.amino_acids_by_mass[next_mass - mass]
+            }
+            for mass, next_masses in graph.items() for next_mass in next_masses
+        ],
+        "solution": spectrum_graph_result["solution"],
+        "truncated": spectrum_graph_result["truncated"]
+    }
 
 
 @method_decorator(csrf_exempt, name='dispatch')
 class BruteForce(View):
 
     @classmethod
-    def post(cls, request):
-        target_spectrum = loads(request.body).get("target_spectrum")
-        peptides = ['']
-        results = {}
-        target_peptide_mass = target_spectrum[-1]
-        tree = {
-            "Root": {
-                "node": "Root",
-                "mass": 0,
-                "children": [],
-                "end": False
-            }
-        }
+    @cached_result("brute_force")
+    async def post(cls, request):
+        body = loads(request.body)
+        target_spectrum = body.get("target_spectrum")
+        budget, refusal = await admit("brute_force", target_spectrum)
+        if refusal is not None:
+            return refusal
 
-        solution = []
-        while len(peptides) > 0:
-            extended_peptides = extend_for_tree(peptides, tree)
+        if body.get("stream"):
+            return ndjson_response(request, tree_events(target_spectrum, False, budget, body.get("stats", False)))
 
-            candidates = []
+        return await solve(budget, brute_force_response, target_spectrum, body.get("tree_format"),
+                           with_stats=body.get("stats", False))
 
-            for peptide in extended_peptides:
-                peptide_mass = calculate_peptide_mass(peptide)
-                tree[peptide]["mass"] = peptide_mass
-                if peptide_mass == target_peptide_mass:
-                    tree[peptide]["end"] = True
-                    calculated_spectrum, spectrum_with_masses = cyclic_spectrum(peptide)
-                    if calculated_spectrum == target_spectrum:
-                        results[peptide] = spectrum_with_masses
-                        solution.append(peptide)
-                elif peptide_mass < target_peptide_mass:
-                    candidates.append(peptide)
-                else:
-                    tree[peptide]["end"] = True
 
-            peptides = candidates
+@method_decorator(csrf_exempt, name='dispatch')
+class BranchAndBound(View):
 
-        response = {
-            "candidates": results,
-            "tree": tree,
-            "solution": solution
-        }
-        return JsonResponse(response, status=200)
+    @classmethod
+    @cached_result("branch_and_bound")
+    async def post(cls, request):
+        body = loads(request.body)
+        target_spectrum = body.get("target_spectrum")
+        budget, refusal = await admit("branch_and_bound", target_spectrum)
+        if refusal is not None:
+            return refusal
+
+        if body.get("stream"):
+            return ndjson_response(request, tree_events(target_spectrum, True, budget, body.get("stats", False)))
+
+        return await solve(budget, branch_and_bound_response, target_spectrum, body.get("tree_format"),
+                           with_stats=body.get("stats", False))
 
 
 @method_decorator(csrf_exempt, name='dispatch')
-class BranchAndBound(View):
+class SpectrumGraph(View):
 
     @classmethod
-    def post(cls, request):
-        target_spectrum = loads(request.body).get("target_spectrum")
-        peptides = ['']
-        results = {}
-        tree = {
-            "Root": {
-                "node": "Root",
-                "mass": 0,
-                "children": [],
-                "end": False,
-                "candidate": False
-            }
-        }
+    @cached_result("spectrum_graph")
+    async def post(cls, request):
+        body = loads(request.body)
+        target_spectrum = body.get("target_spectrum")
+        error = target_spectrum_error(target_spectrum)
+        if error is not None:
+            return JsonResponse({"error": error}, status=400)
 
-        target_peptide_mass = target_spectrum[-1]
-        solution = []
-
-        while len(peptides) > 0:
-            extended_peptides = extend_for_tree(peptides, tree)
-
-            consistent_peptides = []
-
-            for peptide in extended_peptides:
-                peptide_mass = calculate_peptide_mass(peptide)
-                tree[peptide]["mass"] = peptide_mass
-                if peptide_mass == target_peptide_mass:
-                    tree[peptide]["end"] = True
-                    calculated_spectrum, spectrum_with_masses = cyclic_spectrum(peptide)
-                    if calculated_spectrum == target_spectrum:
-                        results[peptide] = spectrum_with_masses
-                        tree[peptide]["candidate"] = True
-                        solution.append(peptide)
-                    else:
-                        tree[peptide]["candidate"] = False
-                elif peptide_mass < target_peptide_mass:
-                    if is_consistent_with_spectrum(peptide, target_spectrum):
-                        consistent_peptides.append(peptide)
-                    else:
-                        tree[peptide]["end"] = True
-                        tree[peptide]["candidate"] = False
-                        tree[peptide]["reason"] = "Teorijski spektar peptida nije konzistentan sa zadatim spektrom."
-                else:
-                    tree[peptide]["end"] = True
-                    tree[peptide]["candidate"] = False
-                    tree[peptide]["reason"] = "Peptid ima preveliku masu i ne može biti rešenje."
-
-            peptides = consistent_peptides
+        # The same graph is estimated, searched and sent back
+        graph = await sync_to_async(spectrum_graph, thread_sensitive=False)(target_spectrum)
+        budget, refusal = await admit("spectrum_graph", target_spectrum, graph=graph)
+        if refusal is not None:
+            return refusal
 
-        response = {
-            "candidates": results,
-            "tree": tree,
-            "solution": solution
-        }
-        return JsonResponse(response, status=200)
+        return await solve(budget, spectrum_graph_response, target_spectrum, graph,
+                           with_stats=body.get("stats", False))
 
 
 @method_decorator(csrf_exempt, name='dispatch')
 class Leaderboard(View):
 
     @classmethod
-    def post(cls, request):
-        target_spectrum = loads(request.body).get("target_spectrum")
+    @cached_result("leaderboard")
+    async def post(cls, request):
+        body = loads(request.body)
+        target_spectrum = body.get("target_spectrum")
+        with_spectrum = body.get("with_spectrum", True)
+        try:
+            tolerance = parse_tolerance(body)
+        except ValueError as error:
+            return JsonResponse({"error": str(error)}, status=400)
 
-        response = leaderboard_sequencing(target_spectrum)
-        return JsonResponse(response, status=200)
+        budget, refusal = await admit("leaderboard", target_spectrum, real_masses=tolerance is not None)
+        if refusal is not None:
+            return refusal
+
+        if body.get("stream"):
+            leaderboard = leaderboard_events(target_spectrum, alphabet_for(tolerance), with_spectrum, budget,
+                                             tolerance, body.get("stats", False))
+            return ndjson_response(request, leaderboard)
+
+        return await solve(budget, leaderboard_response, target_spectrum, with_spectrum, tolerance,
+                           with_stats=body.get("stats", False))
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -136,87 +287,210 @@ class SpectralConvolution(View):
     NUMBER_OF_LARGEST_ELEMENTS = 20
 
     @classmethod
-    def post(cls, request):
-        target_spectrum = loads(request.body).get("target_spectrum")
-        num_of_el_in_spectrum = len(target_spectrum)
-        convolution = []
-
-        for i in range(num_of_el_in_spectrum):
-            for j in range(i):
-                diff = target_spectrum[i] - target_spectrum[j]
-                if 57 <= diff <= 200:
-                    convolution.append(diff)
-
-        freq_dict = {}
-        for mass in convolution:
-            if mass in freq_dict:
-                freq_dict[mass] += 1
-            else:
-                freq_dict[mass] = 1
-
-        sorted_masses = sorted(freq_dict.items(), key=lambda x: x[1], reverse=True)
-        if cls.NUMBER_OF_LARGEST_ELEMENTS > len(sorted_masses):
-            top_masses = [mass for mass, _ in sorted_masses]
-        else:
-            number_of_showing = sorted_masses[cls.NUMBER_OF_LARGEST_ELEMENTS - 1][1]
-            top_masses = [mass for mass, num in sorted_masses if number_of_showing <= num]
+    @cached_result("spectral_convolution")
+    async def post(cls, request):
+        body = loads(request.body)
+        target_spectrum = body.get("target_spectrum")
+        with_spectrum = body.get("with_spectrum", True)
+        error = target_spectrum_error(target_spectrum)
+        if error is not None:
+            return JsonResponse({"error": error}, status=400)
+
+        # Every pair of masses is compared, so the convolution runs in a thread once the length of the spectrum is
+        # known to be within MAX_SPECTRUM_LENGTH
+        sorted_masses, top_masses = await sync_to_async(spectral_convolution, thread_sensitive=False)(
+            target_spectrum, cls.NUMBER_OF_LARGEST_ELEMENTS)
 
         amino_acid_candidates = prepare_amino_acids_that_are_candidates(top_masses)
-        leaderboard_response = leaderboard_sequencing(target_spectrum, amino_acid_candidates)
+        alphabet = Alphabet(amino_acid_candidates)
+        budget, refusal = await admit("spectral_convolution", target_spectrum, alphabet)
+        if refusal is not None:
+            return refusal
 
-        response = {
+        convolution = {
             "amino_acids_in_peptides": sorted_masses,
             "top": top_masses,
             "amino_acid_candidates": amino_acid_candidates,
-            "leaderboard": leaderboard_response["leaderboard"],
-            "solution": leaderboard_response["solution"],
-            "N": leaderboard_response["N"],
             "M": cls.NUMBER_OF_LARGEST_ELEMENTS
         }
 
+        if body.get("stream"):
+            leaderboard = leaderboard_events(target_spectrum, alphabet, with_spectrum, budget,
+                                             with_stats=body.get("stats", False))
+            return ndjson_response(request, chain([convolution], leaderboard))
+
+        return await solve(budget, spectral_convolution_response, target_spectrum, convolution, alphabet,
+                           with_spectrum, with_stats=body.get("stats", False))
+
+
+class Spectrum(View):
+
+    @classmethod
+    def get(cls, request):
+        peptide = request.GET.get("peptide", "")
+        cyclic = request.GET.get("cyclic") == "1"
+
+        if any(amino_acid not in AMINO_ACID_MASSES for amino_acid in peptide):
+            return JsonResponse({"error": "Peptid sadrži nepoznatu aminokiselinu."}, status=400)
+        if len(peptide) > MAX_SPECTRUM_PEPTIDE_LENGTH:
+            return JsonResponse({"error": f"Peptid može imati najviše {MAX_SPECTRUM_PEPTIDE_LENGTH} aminokiselina."},
+                                status=400)
+
+        response = {
+            "peptide": peptide,
+            "cyclic": cyclic,
+            "spectrum": peptide_spectrum(peptide, cyclic)
+        }
+        return JsonResponse(response, status=200)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class PeptideCount(View):
+
+    @classmethod
+    def post(cls, request):
+        # Tells how big the search for the target spectrum is before it is started
+        body = loads(request.body)
+        target_spectrum = body.get("target_spectrum")
+        amino_acid_candidates = body.get("amino_acid_candidates", AMINO_ACID_MASSES.keys())
+
+        if any(amino_acid not in AMINO_ACID_MASSES for amino_acid in amino_acid_candidates):
+            return JsonResponse({"error": "Lista kandidata sadrži nepoznatu aminokiselinu."}, status=400)
+
+        error = target_spectrum_error(target_spectrum)
+        if error is not None:
+            return JsonResponse({"error": error}, status=400)
+
+        target_peptide_mass = target_spectrum[-1]
+        response = {
+            "mass": target_peptide_mass,
+            **count_peptides(target_peptide_mass, Alphabet(amino_acid_candidates))
+        }
         return JsonResponse(response, status=200)
 
 
 @method_decorator(csrf_exempt, name='dispatch')
 class TimedExecutions(View):
     NUMBER_OF_LARGEST_ELEMENTS = 20
+    TIMEOUT_IN_SECONDS = {
+        "brute_force": 120,
+        "bnb": 60,
+        "leaderboard": 60,
+        "convolution": 60,
+        "spectrum_graph": 60
+    }
+    RETRY_AFTER_IN_SECONDS = 30
 
     @classmethod
-    def post(cls, request):
+    @cached_result("timed_executions")
+    async def post(cls, request):
         target_spectrum = loads(request.body).get("target_spectrum")
+        # Checked before a slot is taken, so a spectrum that can't be searched neither waits for one nor holds it
+        error = target_spectrum_error(target_spectrum)
+        if error is not None:
+            return JsonResponse({"error": error}, status=400)
+
+        executions = {
+            "brute_force": (brute_force_sequencing, target_spectrum),
+            "bnb": (branch_and_bound_sequencing, target_spectrum),
+            "leaderboard": (leaderboard_sequencing_without_additional_data, target_spectrum),
+            "convolution": (convolution_sequencing, target_spectrum, cls.NUMBER_OF_LARGEST_ELEMENTS),
+            "spectrum_graph": (spectrum_graph_sequencing, target_spectrum)
+        }
 
-        # BRUTE FORCE
-        start_brute_force = timeit.default_timer()
-        brute_force = brute_force_sequencing(target_spectrum)
-        end_brute_force = timeit.default_timer()
-        elapsed_time_brute_force = end_brute_force - start_brute_force
-        brute_force["execution_time"] = f"{elapsed_time_brute_force:.4f}"
-
-        # BRANCH AND BOUND
-        start_branch_and_bound = timeit.default_timer()
-        branch_and_bound = branch_and_bound_sequencing(target_spectrum)
-        end_branch_and_bound = timeit.default_timer()
-        elapsed_time_branch_and_bound = end_branch_and_bound - start_branch_and_bound
-        branch_and_bound["execution_time"] = f"{elapsed_time_branch_and_bound:.4f}"
-
-        # LEADERBOARD
-        start_leaderboard = timeit.default_timer()
-        leaderboard = leaderboard_sequencing_without_additional_data(target_spectrum)
-        end_leaderboard = timeit.default_timer()
-        elapsed_time_leaderboard = end_leaderboard - start_leaderboard
-        leaderboard["execution_time"] = f"{elapsed_time_leaderboard:.4f}"
-
-        # CONVOLUTION
-        start_convolution = timeit.default_timer()
-        convolution = convolution_sequencing(target_spectrum, cls.NUMBER_OF_LARGEST_ELEMENTS)
-        end_convolution = timeit.default_timer()
-        elapsed_time_convolution = end_convolution - start_convolution
-        convolution["execution_time"] = f"{elapsed_time_convolution:.4f}"
+        slots = timed_execution_slots()
+        if not slots.acquire(blocking=False):
+            return JsonResponse({"error": "Server je zauzet merenjem vremena izvršavanja, pokušajte ponovo kasnije."},
+                                status=503, headers={"Retry-After": str(cls.RETRY_AFTER_IN_SECONDS)})
+
+        # The solvers run in their own pool, the thread only waits for them
+        try:
+            response = await sync_to_async(parallel_timed_executions, thread_sensitive=False)(executions,
+                                                                                             cls.TIMEOUT_IN_SECONDS)
+        finally:
+            slots.release()
+
+        if any(result.get("timed_out") or result.get("truncated") for result in response.values()):
+            # Results that timed out or were truncated shouldn't be served from the cache later
+            return JsonResponse(response, status=200, headers={"Cache-Control": "no-store"})
 
-        response = {
-            "brute_force": brute_force,
-            "bnb": branch_and_bound,
-            "leaderboard": leaderboard,
-            "convolution": convolution
-        }
         return JsonResponse(response, status=200)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class Jobs(View):
+
+    @classmethod
+    def post(cls, request):
+        body = loads(request.body)
+        algorithm = body.get("algorithm")
+        if algorithm not in JOB_ALGORITHMS:
+            return JsonResponse({"error": "Nepoznat algoritam."}, status=400)
+
+        try:
+            parameters = search_parameters(algorithm, body)
+        except ValueError as error:
+            return JsonResponse({"error": str(error)}, status=400)
+
+        target_spectrum = body.get("target_spectrum")
+        error = target_spectrum_error(target_spectrum, "tolerance" in parameters)
+        if error is not None:
+            return JsonResponse({"error": error}, status=400)
+
+        job = submit_job(algorithm, target_spectrum, parameters)
+        return JsonResponse(job_response(job), status=202)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class JobDetail(View):
+
+    @classmethod
+    def get(cls, request, job_id):
+        job = Job.objects.filter(pk=job_id).first()
+        if job is None:
+            return JsonResponse({"error": "Posao ne postoji."}, status=404)
+
+        return JsonResponse(job_response(job), status=200)
+
+    @classmethod
+    def delete(cls, request, job_id):
+        job = Job.objects.filter(pk=job_id).first()
+        if job is None:
+            return JsonResponse({"error": "Posao ne postoji."}, status=404)
+
+        cancel_job(job)
+        return JsonResponse(job_response(job), status=200)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class Batch(View):
+
+    @classmethod
+    async def post(cls, request):
+        # Sequences many spectra with the same algorithm. Every line of the response has the result of one spectrum
+        # and its index in the request, in the order in which the searches finish.
+        body = loads(request.body)
+        algorithm = body.get("algorithm")
+        if algorithm not in JOB_ALGORITHMS:
+            return JsonResponse({"error": "Nepoznat algoritam."}, status=400)
+
+        try:
+            parameters = search_parameters(algorithm, body)
+        except ValueError as error:
+            return JsonResponse({"error": str(error)}, status=400)
+
+        spectra = body.get("spectra")
+        if (not isinstance(spectra, list) or not 0 < len(spectra) <= BATCH_MAX_SPECTRA
+                or any(target_spectrum_error(target_spectrum, "tolerance" in parameters) is not None
+                       for target_spectrum in spectra)):
+            return JsonResponse({"error": "Lista spektara nije ispravna."}, status=400)
+
+        return StreamingHttpResponse(batch_lines(algorithm, spectra, parameters), content_type="application/x-ndjson")
+
+
+class Metrics(View):
+
+    @classmethod
+    def get(cls, request):
+        # Counters of the searches answered by this server process, in the Prometheus text format
+        return HttpResponse(METRICS.prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -16,7 +16,8 @@ import {
   TreeVisualizationRenderer,
   VisualizationResult,
   TreeNode,
-  downloadSVG
+  downloadSVG,
+  treeFromColumns
 } from "@/components/tree_visualization"
 
 const fetchData = async (sequence: string, setTargetMass: (mass: number) => void): Promise<VisualizationResult> => {
@@ -40,7 +41,7 @@ const fetchData = async (sequence: string, setTargetMass: (mass: number) => void
       headers: {
         "Content-Type": "application/json",
       },
-      body: JSON.stringify({ target_spectrum: numbers }),
+      body: JSON.stringify({ target_spectrum: numbers, tree_format: "columnar" }),
     })
 
     if (!response.ok) {
@@ -48,6 +49,8 @@ const fetchData = async (sequence: string, setTargetMass: (mass: number) => void
     }
 
     const data = await response.json()
+    // The tree comes as parallel arrays, which are much smaller than the tree keyed by peptides
+    data.tree = treeFromColumns(data.tree, false)
     return data
   } catch (error) {
     console.error("Greška prilikom pozivanja backend-a:", error)
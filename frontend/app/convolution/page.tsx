@@ -33,7 +33,7 @@ interface SpectrumItem {
 interface PeptideCandidate {
   peptide: string
   number_of_matches: number
-  spectrum: SpectrumItem[]
+  spectrum?: SpectrumItem[]
   mass: number
   qualified: boolean
   reason?: string
@@ -43,7 +43,7 @@ interface PeptideCandidate {
 interface Solution {
   peptide: string
   mass: number
-  spectrum: SpectrumItem[]
+  spectrum?: SpectrumItem[]
   number_of_matches: number
 }
 
@@ -217,6 +217,7 @@ export default function ConvolutionPage() {
       },
       body: JSON.stringify({
         target_spectrum: targetSequence,
+        with_spectrum: false,
       }),
     })
 
@@ -27,7 +27,7 @@ interface SpectrumItem {
 interface PeptideCandidate {
   peptide: string
   number_of_matches: number
-  spectrum: SpectrumItem[]
+  spectrum?: SpectrumItem[]
   mass: number
   qualified: boolean
   reason?: string
@@ -37,7 +37,7 @@ interface PeptideCandidate {
 interface Solution {
   peptide: string
   mass: number
-  spectrum: SpectrumItem[]
+  spectrum?: SpectrumItem[]
   number_of_matches: number
 }
 
@@ -133,6 +133,7 @@ export default function LeaderboardPage() {
         },
         body: JSON.stringify({
           target_spectrum: parsedSequence,
+          with_spectrum: false,
         }),
       })
 
@@ -1,9 +1,10 @@
 "use client"
 
 import type React from "react"
+import { useState, useEffect } from "react"
 
 import { Button } from "@/components/ui/button"
-import { ChevronLeft, ChevronRight, RotateCcw, Trophy, Crown, Medal, ArrowRight, Info, CheckCircle, XCircle } from "lucide-react"
+import { ChevronLeft, ChevronRight, RotateCcw, Trophy, Crown, Medal, ArrowRight, Info, CheckCircle, XCircle, Loader2 } from "lucide-react"
 import { Card } from "@/components/ui/card"
 import { ZoomableSpectrum } from "@/components/zoom_spectrum/visualization_controls"
 
@@ -21,6 +22,92 @@ interface RoundNavigationProps {
   className?: string
 }
 
+interface SpectrumItem {
+  mass: number
+  subpeptide: string
+}
+
+interface SpectrumOwner {
+  peptide: string
+  candidate?: boolean
+  spectrum?: SpectrumItem[]
+}
+
+// Leaderboards are requested without the spectra of the candidates. The spectrum of a candidate is fetched once it
+// is shown and kept for the next time it is shown.
+const spectra = new Map<string, Promise<SpectrumItem[]>>()
+
+const fetchSpectrum = (peptide: string, cyclic: boolean): Promise<SpectrumItem[]> => {
+  const key = `${peptide}/${cyclic}`
+  let spectrum = spectra.get(key)
+  if (!spectrum) {
+    const query = `peptide=${encodeURIComponent(peptide)}&cyclic=${cyclic ? 1 : 0}`
+    spectrum = fetch(`${process.env.NEXT_PUBLIC_LOCALHOST_URL}/sequencing/spectrum/?${query}`)
+      .then((response) => {
+        if (!response.ok) {
+          throw new Error(`HTTP error! Status: ${response.status}`)
+        }
+        return response.json()
+      })
+      .then((data) => data.spectrum)
+    // A failed request is tried again the next time the candidate is shown
+    spectrum.catch(() => spectra.delete(key))
+    spectra.set(key, spectrum)
+  }
+  return spectrum
+}
+
+// Spectrum sent with the candidate, or the fetched one once it arrives. Peptides that reached the target mass carry
+// the candidate field and are shown with their cyclic spectrum, the rest of the leaderboard with the linear one.
+const useSpectrum = (owner?: SpectrumOwner): SpectrumItem[] | null => {
+  const [fetched, setFetched] = useState<{ key: string; spectrum: SpectrumItem[] } | null>(null)
+  const peptide = owner?.peptide
+  const cyclic = owner?.candidate !== undefined
+  const sent = owner?.spectrum
+
+  useEffect(() => {
+    if (sent || peptide === undefined) return
+
+    let active = true
+    fetchSpectrum(peptide, cyclic)
+      .then((spectrum) => {
+        if (active) setFetched({ key: `${peptide}/${cyclic}`, spectrum })
+      })
+      .catch((error) => console.error("Greška prilikom učitavanja spektra:", error))
+
+    return () => {
+      active = false
+    }
+  }, [peptide, cyclic, sent])
+
+  if (sent) return sent
+  return fetched !== null && fetched.key === `${peptide}/${cyclic}` ? fetched.spectrum : null
+}
+
+function CandidateSpectrum({ candidate, solution, isSolution }: { candidate: any; solution?: SpectrumOwner; isSolution: boolean }) {
+  const spectrum = useSpectrum(candidate)
+  const solutionSpectrum = useSpectrum(solution)
+
+  if (!spectrum) {
+    return (
+      <div className="flex items-center justify-center h-[180px]">
+        <Loader2 className="h-6 w-6 animate-spin text-muted-foreground" />
+      </div>
+    )
+  }
+
+  return (
+    <ZoomableSpectrum
+      spectrum={spectrum}
+      experimentalSpectrum={solutionSpectrum?.map((item) => item.mass) || []}
+      peptide={candidate.peptide}
+      qualified={candidate.qualified}
+      isSolution={isSolution}
+      height={180}
+    />
+  )
+}
+
 export function renderCandidates(
     data: any, 
     currentRound: number,
@@ -151,14 +238,7 @@ export function renderCandidates(
 
                   <div className="px-4 pb-4">
                     <p className="text-sm font-medium mb-2">Teorijski spektar:</p>
-                    <ZoomableSpectrum
-                      spectrum={candidate.spectrum}
-                      experimentalSpectrum={data.solution[0]?.spectrum.map((item: any) => item.mass) || []}
-                      peptide={candidate.peptide}
-                      qualified={candidate.qualified}
-                      isSolution={isSolution}
-                      height={180}
-                    />
+                    <CandidateSpectrum candidate={candidate} solution={data.solution[0]} isSolution={isSolution} />
                   </div>
                 </div>
               )
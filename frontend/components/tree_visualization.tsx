@@ -473,6 +473,59 @@ export interface TheoreticalSpectrum {
   [peptide: string]: SpectrumItem[]
 }
 
+// Tree sent with tree_format "columnar": node i has parent parent[i] (-1 for the root), was extended by
+// amino_acids[amino_acid[i]] and has the given mass and status
+export interface ColumnarTree {
+  format: "columnar"
+  amino_acids: string[]
+  parent: number[]
+  amino_acid: number[]
+  mass: number[]
+  status: number[]
+  reasons: { [status: string]: string }
+}
+
+// Statuses of the nodes of a columnar tree, the same as on the backend
+const PEPTIDE_EXTENDABLE = 0
+const PEPTIDE_SOLUTION = 1
+const PEPTIDE_INCONSISTENT = 3
+const PEPTIDE_TOO_HEAVY = 4
+
+// Rebuilds the tree keyed by peptides from a columnar tree. Nodes get the same fields the backend sets in the
+// tree keyed by peptides, with markCandidates for branch and bound.
+export const treeFromColumns = (columns: ColumnarTree, markCandidates: boolean): { [key: string]: TreeNode } => {
+  const names: string[] = []
+  const tree: { [key: string]: TreeNode } = {}
+
+  columns.parent.forEach((parent, index) => {
+    const prefix = parent <= 0 ? "" : names[parent]
+    const name = parent === -1 ? "Root" : prefix + columns.amino_acids[columns.amino_acid[index]]
+    const status = columns.status[index]
+    const node: TreeNode = {
+      node: name,
+      mass: columns.mass[index],
+      children: [],
+      end: status !== PEPTIDE_EXTENDABLE,
+      candidate: false,
+    }
+
+    if (markCandidates && status === PEPTIDE_SOLUTION) {
+      node.candidate = true
+    }
+    if (status === PEPTIDE_INCONSISTENT || (markCandidates && status === PEPTIDE_TOO_HEAVY)) {
+      node.reason = columns.reasons[status]
+    }
+
+    names.push(name)
+    tree[name] = node
+    if (parent !== -1) {
+      tree[names[parent]].children.push(name)
+    }
+  })
+
+  return tree
+}
+
 export const NODE_RADIUS = 35
 
 export const calculateEdgePoint = (x1: number, y1: number, x2: number, y2: number, radius: number) => {